@@ -1,16 +1,30 @@
-from flask import Flask, render_template, request, abort, jsonify
-from docx import Document
+from flask import Flask, Response, render_template, request, abort, jsonify, redirect, stream_with_context, url_for
 from datetime import datetime
 import os
 import tempfile
+import shutil
 import io
-import boto3
-from botocore.exceptions import NoCredentialsError
+import threading
 from dotenv import load_dotenv
 import logging
-from typing import Dict, Any, Optional
-import zipfile
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import re
 from dataclasses import dataclass, field
+from template_registry import LoadedTemplate, TemplateRegistry, compile_placeholder_pattern
+from zip_writer import ChunkSink, ZipStreamWriter
+from jobs import JOB_DONE, JobManager, create_job_store
+from bulk import BULK_FORMATS, BulkGenerator, detect_format, read_records
+from replacements import ComputedField, LazyReplacements
+from field_schema import compile_schema
+from batch_format import format_totals
+from output_cache import OutputCache, SubmissionLog, changed_placeholders, make_cache_key
+from archiver import ArchiveQueue
+from docx_xml import MAIN_DOCUMENT_PART, replace_in_paragraph, serialize_part, write_package
+
+if TYPE_CHECKING:
+    from docx.document import Document
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,18 +36,38 @@ load_dotenv()
 # Import your modules with error handling
 try:
     from form_fields import FIELDS
-    from s3_bucketHandler import serve_s3_file_as_attachment
+    from s3_bucketHandler import get_mime_type, serve_bytes_as_attachment, serve_stream_as_attachment
+    from storage import create_storage
 except ImportError as e:
     logger.error(f"Failed to import modules: {e}")
     FIELDS = []
-    # Fallback function if s3_bucketHandler is not available
-    def serve_s3_file_as_attachment(s3_client, bucket, path, filename):
+    # Fallback functions if s3_bucketHandler is not available
+    def serve_stream_as_attachment(chunks, filename, content_length=None):
+        return jsonify({"error": "S3 handler not available"}), 500
+
+    def serve_bytes_as_attachment(content, filename):
         return jsonify({"error": "S3 handler not available"}), 500
 
+    def get_mime_type(filename):
+        return 'application/octet-stream'
+
+    def create_storage(backend, *args, **kwargs):
+        return None
+
 @dataclass
 class AppConfig:
     """Application configuration class"""
     bucket_name: str = os.getenv("S3_BUCKET_NAME", "efiling-store")
+    # S3 client tuning; a pool size of 0 sizes the connection pool from the thread counts below
+    s3_max_pool_connections: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "0"))
+    s3_retry_mode: str = os.getenv("S3_RETRY_MODE", "adaptive")
+    s3_max_attempts: int = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+    s3_connect_timeout: float = float(os.getenv("S3_CONNECT_TIMEOUT", "5"))
+    s3_read_timeout: float = float(os.getenv("S3_READ_TIMEOUT", "30"))
+    # upload_fileobj: objects above the threshold go up in parallel parts of the chunk size
+    s3_multipart_threshold: int = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+    s3_multipart_chunksize: int = int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024)))
+    s3_transfer_concurrency: int = int(os.getenv("S3_TRANSFER_CONCURRENCY", "4"))
     template_file: str = "template.docx"
     templates: Dict[str, str] = field(default_factory=lambda: {
         "base-template": "template.docx",
@@ -44,17 +78,74 @@ class AppConfig:
         "process-memo-template": "process_memo_template.docx",
         "vakkalath-template": "vakkalath_template.docx"
     })
+    # Renderer per template: "docx" (python-docx) or "xml" (direct lxml edits of word/document.xml)
+    render_mode: str = os.getenv("RENDER_MODE", "docx")
+    template_render_modes: Dict[str, str] = field(default_factory=dict)
     output_prefix: str = "/output/"
+    # Where generated files are kept: "s3", "local" (a directory) or "memory". The local directory is
+    # private and its files are streamed by the app; only set LOCAL_STORAGE_URL if something else
+    # serves that directory behind its own access control
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "s3")
+    local_storage_root: str = os.getenv("LOCAL_STORAGE_ROOT", os.path.join(tempfile.gettempdir(), "efiling-store"))
+    local_storage_url: Optional[str] = os.getenv("LOCAL_STORAGE_URL") or None
+    # How generated files reach the browser: "attachment" serves the bytes from this worker,
+    # "presigned" redirects to (or returns as JSON) a short-lived S3 presigned URL
+    delivery_mode: str = os.getenv("DELIVERY_MODE", "attachment")
+    presigned_url_expiry: int = int(os.getenv("PRESIGNED_URL_EXPIRY", "300"))
+    # Rendered-output cache: in-process LRU size in bytes (0 disables), plus an optional tier in storage.
+    # The storage tier adds a storage GET to every render that misses in memory; its writes are archived
+    # in the background (or synchronously with ARCHIVE_MODE=sync)
+    output_cache_bytes: int = int(os.getenv("OUTPUT_CACHE_BYTES", str(64 * 1024 * 1024)))
+    output_cache_s3: bool = os.getenv("OUTPUT_CACHE_S3", "false").lower() == "true"
+    output_cache_prefix: str = "/cache/"
+    # Recent submissions remembered for /regenerate-changed (0 disables)
+    submission_log_size: int = int(os.getenv("SUBMISSION_LOG_SIZE", "256"))
+    # Archival of generated documents: "background" writes to storage after the response is sent
+    # (bounded queue, retries, spooled to archive_spool_dir when it can't keep up or on exit), "sync" before.
+    # Serverless platforms freeze the process once the response is sent, so Vercel defaults to "sync"
+    archive_mode: str = os.getenv("ARCHIVE_MODE", "sync" if os.getenv("VERCEL") else "background")
+    archive_queue_size: int = int(os.getenv("ARCHIVE_QUEUE_SIZE", "256"))
+    archive_workers: int = int(os.getenv("ARCHIVE_WORKERS", "2"))
+    archive_retries: int = int(os.getenv("ARCHIVE_RETRIES", "3"))
+    archive_spool_dir: str = os.getenv("ARCHIVE_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "efiling-archive-spool"))
+    # Background jobs: worker threads and where job state lives ("memory" or "sqlite"). The memory store
+    # is only visible to the process that accepted the job, so multi-process servers need "sqlite"
+    # (gunicorn.conf.py selects it); it keeps finished jobs for job_retention seconds
+    job_workers: int = int(os.getenv("JOB_WORKERS", "2"))
+    job_store: str = os.getenv("JOB_STORE", "memory")
+    job_db_path: str = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+    job_max_jobs: int = int(os.getenv("JOB_MAX_JOBS", "1024"))
+    job_retention: float = float(os.getenv("JOB_RETENTION", "3600"))
+    # Job threads are frozen once a serverless response is sent and polls may reach another instance,
+    # so job mode is off by default on Vercel
+    jobs_enabled: bool = os.getenv("JOBS_ENABLED", "false" if os.getenv("VERCEL") else "true").lower() == "true"
+    # Worker threads shared by all requests for concurrent document generation and S3 calls
+    max_workers: int = int(os.getenv("MAX_WORKERS", "8"))
     host: str = "0.0.0.0"
     port: int = 5000
     debug: bool = False
+    # "lazy" defers boto3, python-docx and the S3 client to the first request that needs them,
+    # "warm" also preloads every template at import, "eager" additionally creates the S3 client
+    startup_mode: str = os.getenv("STARTUP_MODE", "lazy")
+    
+    @property
+    def s3_pool_size(self) -> int:
+        """Connections the S3 client keeps open: one per thread that can talk to S3 at once"""
+        if self.s3_max_pool_connections > 0:
+            return self.s3_max_pool_connections
+        archive_threads = self.archive_workers * self.s3_transfer_concurrency if self.archive_mode == "background" else 0
+        return self.max_workers * self.s3_transfer_concurrency + self.job_workers + archive_threads
 
 class DocumentProcessor:
     """Handles document processing operations"""
     
-    def __init__(self, s3_client, bucket_name: str):
-        self.s3_client = s3_client
-        self.bucket_name = bucket_name
+    def __init__(self, storage, registry: TemplateRegistry, cache: Optional[OutputCache] = None,
+                 archiver: Optional[ArchiveQueue] = None):
+        # Any backend from storage.py: S3, a local directory or memory
+        self.storage = storage
+        self.registry = registry
+        self.cache = cache
+        self.archiver = archiver
     
     @staticmethod
     def get_custom_datetime_format() -> str:
@@ -98,180 +189,235 @@ class DocumentProcessor:
         formatted_rest = ','.join(grouped)[::-1]
         return formatted_rest + ',' + last_three
 
-    def _replace_text_in_docx(self, doc: Document, replacements: Dict[str, str]) -> None:
-        """Replace text in document paragraphs and tables while preserving formatting"""
-        # Replace text in paragraphs
-        for paragraph in doc.paragraphs:
-            self._replace_text_in_paragraph(paragraph, replacements)
-    
-        # Replace text in tables
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        self._replace_text_in_paragraph(paragraph, replacements)
-
-    def _replace_text_in_paragraph(self, paragraph, replacements: Dict[str, str]) -> None:
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _compile_placeholder_pattern(placeholders: Tuple[str, ...]) -> "re.Pattern[str]":
+        """Compile one alternation matching every placeholder, longest first"""
+        return compile_placeholder_pattern(placeholders)
+
+    @staticmethod
+    def get_placeholder_pattern(replacements: Dict[str, str]) -> "re.Pattern[str]":
+        """Return the compiled matcher for the keys of a replacements dict"""
+        return DocumentProcessor._compile_placeholder_pattern(tuple(sorted(replacements)))
+
+    def _replace_text_in_docx(self, doc: "Document", template: LoadedTemplate, replacements: Dict[str, str]) -> None:
+        """Replace text in the indexed paragraphs of a document while preserving formatting"""
+        # python-docx is only imported once a document is actually rendered
+        from docx.text.paragraph import Paragraph
+        
+        pattern = self.get_placeholder_pattern(replacements)
+        # Last to first, so rewriting a paragraph never shifts the path of one still to be visited
+        for location in reversed(template.part_index.get(MAIN_DOCUMENT_PART, [])):
+            # Skip paragraphs whose placeholders have nothing to substitute
+            if location.placeholders.isdisjoint(replacements):
+                continue
+            paragraph = Paragraph(template.locate(doc.element, location), doc)
+            self._replace_text_in_paragraph(paragraph, replacements, pattern)
+
+    def _replace_text_in_paragraph(self, paragraph, replacements: Dict[str, str],
+                                   pattern: Optional["re.Pattern[str]"] = None) -> None:
         """Replace text in a paragraph while preserving formatting"""
-        # Get the full text of the paragraph
-        full_text = paragraph.text
-        
-        # Check if any replacements are needed
-        needs_replacement = False
-        for old_text in replacements.keys():
-            if old_text in full_text:
-                needs_replacement = True
-                break
-        
-        if not needs_replacement:
-            return
-        
-        # Perform all replacements on the full text
-        modified_text = full_text
-        for old_text, new_text in replacements.items():
-            modified_text = modified_text.replace(old_text, str(new_text))
-        
-        # If text hasn't changed, no need to update
-        if modified_text == full_text:
-            return
-        
-        # Clear existing runs and add new text with base formatting
-        if paragraph.runs:
-            # Preserve the formatting of the first run
-            first_run = paragraph.runs[0]
-            font = first_run.font
+        if pattern is None:
+            pattern = self.get_placeholder_pattern(replacements)
+
+        # Only the runs a placeholder spans are rewritten; every other run keeps its formatting
+        replace_in_paragraph(paragraph._p, replacements, pattern)
+
+    def _render_docx(self, template: LoadedTemplate, replacements: Dict[str, str]) -> bytes:
+        """Fill a clone of the template through python-docx and repackage it"""
+        # Headers, footers and notes are always edited with lxml
+        replaced_parts = self._render_parts(template, replacements)
+        if MAIN_DOCUMENT_PART in template.part_index:
+            doc = template.clone()
+            self._replace_text_in_docx(doc, template, replacements)
+            replaced_parts[MAIN_DOCUMENT_PART] = serialize_part(doc.element)
+
+        # Parts without placeholders are copied from the template as-is
+        return write_package(template.members, replaced_parts)
+
+    def _render_xml(self, template: LoadedTemplate, replacements: Dict[str, str]) -> bytes:
+        """Fill copies of the template's story parts with lxml and repackage them, without python-docx"""
+        return write_package(template.members, self._render_parts(template, replacements))
+
+    def _render_parts(self, template: LoadedTemplate, replacements: Dict[str, str]) -> Dict[str, bytes]:
+        """Fill every indexed part held as an lxml tree and return the serialized parts"""
+        pattern = self.get_placeholder_pattern(replacements)
+        replaced_parts = {}
+        for part_name, root in template.part_roots.items():
+            locations = [
+                location for location in template.part_index[part_name]
+                if not location.placeholders.isdisjoint(replacements)
+            ]
+            if not locations:
+                continue
+            root = template.clone_part(part_name)
+            for location in reversed(locations):
+                replace_in_paragraph(template.locate(root, location), replacements, pattern)
+            replaced_parts[part_name] = serialize_part(root)
+        return replaced_parts
+
+    def render_document(self, template_path: str, replacements: Dict[str, str]) -> Optional[bytes]:
+        """Render a DOCX template with replacements and return the document bytes"""
+        try:
+            template = self.registry.get(template_path)
             
-            # Store formatting properties
-            font_name = font.name
-            font_size = font.size
-            bold = font.bold
-            italic = font.italic
-            underline = font.underline
-            color = font.color.rgb if font.color.rgb else None
+            # Identical inputs render identical bytes, so reuse an earlier render when we have one
+            cache_key = None
+            if self.cache is not None:
+                cache_key = make_cache_key(template.version, replacements, template.placeholders)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Output cache hit for {template_path}")
+                    return cached
             
-            # Clear all runs
-            paragraph.clear()
+            if template.render_mode == "xml":
+                content = self._render_xml(template, replacements)
+            else:
+                content = self._render_docx(template, replacements)
             
-            # Add new run with preserved formatting
-            new_run = paragraph.add_run(modified_text)
-            new_run.font.name = font_name
-            new_run.font.size = font_size
-            new_run.font.bold = bold
-            new_run.font.italic = italic
-            new_run.font.underline = underline
-            if color:
-                new_run.font.color.rgb = color
-        else:
-            # If no runs exist, just add the text
-            paragraph.add_run(modified_text)
-
-    def process_docx(self, template_path: str, replacements: Dict[str, str], output_path: str) -> bool:
-        """Process DOCX template with replacements and upload to S3"""
-        try:
-            if not os.path.exists(template_path):
-                logger.error(f"Template file not found: {template_path}")
-                return False
-        
-            doc = Document(template_path)
-            self._replace_text_in_docx(doc, replacements)
-        
-            # Save to in-memory buffer
-            output_stream = io.BytesIO()
-            doc.save(output_stream)
-            output_stream.seek(0)
-        
-            # Upload to S3
-            self.s3_client.upload_fileobj(output_stream, self.bucket_name, output_path)
-            logger.info(f"Document successfully processed and uploaded: {output_path}")
-            return True
+            if cache_key is not None:
+                self.cache.put(cache_key, content)
+            return content
         
         except FileNotFoundError as e:
             logger.error(f"Template file not found: {e}")
-            return False
+            return None
         except Exception as e:
             logger.error(f"Document processing failed: {e}")
+            return None
+
+    def store_document(self, content: bytes, output_path: str) -> bool:
+        """Save rendered document bytes to the configured storage"""
+        try:
+            self.storage.put(output_path, content, get_mime_type(output_path))
+            logger.info(f"Document successfully stored: {output_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Document storage failed for {output_path}: {e}")
             return False
 
+    def archive_document(self, content: bytes, output_path: str) -> None:
+        """Keep a copy of a document in storage, in the background when an archiver is configured"""
+        if self.archiver is not None:
+            self.archiver.submit(output_path, content, get_mime_type(output_path))
+        elif not self.store_document(content, output_path):
+            logger.warning(f"{output_path} was not persisted to storage")
+
+# FIELDS compiled once at import; the form, request handling and bulk input all use this schema
+FIELD_SCHEMA = compile_schema(FIELDS, {
+    "text": str,
+    "textarea": str,
+    "uppercase": str.upper,
+    "date": DocumentProcessor.convert_date_format,
+    "number": DocumentProcessor.format_number_indian,
+})
+
 class FormDataProcessor:
     """Handles form data processing and validation"""
     
+    @staticmethod
+    def get_missing_fields(data: Dict[str, Any]) -> List[str]:
+        """Return the names of required form fields that are empty"""
+        return FIELD_SCHEMA.missing(data)
+    
+    @staticmethod
+    def get_field_errors(data: Dict[str, Any]) -> Dict[str, str]:
+        """Return validation messages by field name"""
+        return FIELD_SCHEMA.errors(data)
+    
     @staticmethod
     def validate_form_data(data: Dict[str, Any]) -> bool:
         """Validate required form fields"""
-        if not FIELDS:
-            return True
-            
-        required_fields = [field["name"] for field in FIELDS if field.get("required", False)]
-        missing_fields = [field for field in required_fields if not data.get(field)]
+        errors = FormDataProcessor.get_field_errors(data)
         
-        if missing_fields:
-            logger.warning(f"Missing required fields: {missing_fields}")
+        if errors:
+            logger.warning(f"Invalid form fields: {errors}")
             return False
         return True
     
     @staticmethod
-    def build_replacements(data: Dict[str, Any]) -> Dict[str, str]:
-        """Build replacement dictionary from form data"""
-        replacements = {}
-        
-        # Process basic field replacements
-        for field in FIELDS:
-            field_name = field["name"]
-            placeholder = field["placeholder"]
-            field_value = data.get(field_name, "")
-            field_type = field.get("datatype")
-            
-            if field_type.strip() == "date":
-                field_value = DocumentProcessor.convert_date_format(field_value)
-            if field_type.strip() == "number":
-                field_value = DocumentProcessor.format_number_indian(field_value)
-            replacements[placeholder] = str(field_value)
-        
-        # Add computed fields
-        replacements.update(FormDataProcessor._build_computed_replacements(replacements))
-        
-        return replacements
+    def build_replacements(data: Dict[str, Any]) -> LazyReplacements:
+        """Build replacement mapping from form data; computed fields are derived on first use"""
+        return LazyReplacements(FIELD_SCHEMA.convert(data), COMPUTED_FIELDS)
     
     @staticmethod
-    def _build_computed_replacements(replacements: Dict[str, str]) -> Dict[str, str]:
-        """Build computed replacement fields"""
-        computed = {}
+    def build_replacements_batch(records: List[Dict[str, Any]]) -> List[LazyReplacements]:
+        """build_replacements for many records, formatting whole columns at once"""
+        rows = FIELD_SCHEMA.convert_batch(records)
+        totals = format_totals(
+            DocumentProcessor.format_number_indian,
+            *([row.get(placeholder, "") for row in rows] for placeholder in ("(AMNT1)", "(AMNT2)", "(AMNT3)")),
+        )
+        current_date = DocumentProcessor.get_formatted_current_date()
         
-        # Build cause of action text
-        cause_of_action = f"The cause of action for this claim petition arose on {replacements.get('(DATE1)', '')}, when the respondent initiated proceedings to draw electrical lines through the property of the petitioner, and thereafter on {replacements.get('(COA_DATE1)', '')}, when the respondent paid an amount of ₹ {replacements.get('(COA_AMNT1)', '')} as compensation to the petitioner."
+        batch = []
+        for row, total in zip(rows, totals):
+            replacements = LazyReplacements(row, COMPUTED_FIELDS)
+            # Column-wide values are set up front; the remaining computed fields stay lazy
+            replacements["(TOTAL_AMOUNT)"] = total
+            replacements["(CURRENT_DATE)"] = current_date
+            batch.append(replacements)
+        return batch
+    
+    @staticmethod
+    def add_petitioner_address(replacements: Dict[str, str], use_property_address: bool) -> None:
+        """Fill (PETITIONER_ADDRESS) from the property location, or blank it"""
+        if use_property_address:
+            village = replacements.get("(VILLAGE)", "")
+            taluk = replacements.get("(TALUK)", "")
+            district = replacements.get("(DISTRICT)", "")
+            pincode = replacements.get("(PINCODE)", "")
+            replacements["(PETITIONER_ADDRESS)"] = f"{village} Village, {taluk} Taluk, {district} District. PIN -{pincode}"
+        else:
+            replacements["(PETITIONER_ADDRESS)"] = ""
+    
+    @staticmethod
+    def _cause_of_action(date1: str, coa_date1: str, coa_amount1: str, village: str, taluk: str) -> str:
+        """Build cause of action text"""
+        cause_of_action = f"The cause of action for this claim petition arose on {date1}, when the respondent initiated proceedings to draw electrical lines through the property of the petitioner, and thereafter on {coa_date1}, when the respondent paid an amount of ₹ {coa_amount1} as compensation to the petitioner."
         
         # Add jurisdiction clause
-        village = replacements.get("(VILLAGE)", "")
-        taluk = replacements.get("(TALUK)", "")
         cause_of_action += f"Thereafter, continuously at {village} Village in {taluk} Taluk which is within the jurisdiction of this Honourable Court."
-        
-        computed["(CAUSE_OF_ACTION)"] = cause_of_action
-        
-        # Handle ARES2 field
-        ares2 = replacements.get("(ARES2)", "0")
-        syno2 = replacements.get("(SYNO2)", "")
+        return cause_of_action
+    
+    @staticmethod
+    def _ares2_clause(ares2: str, syno2: str) -> str:
+        """Describe the second survey number, or nothing when no area is given"""
         if ares2 and ares2 != "0":
-            computed["(ARES2)"] = f"and {ares2} of property comprised in Sy.No. {syno2}"
-        else:
-            computed["(ARES2)"] = ""
-        
-        # Add other computed fields
-        computed["(DISTRICT)"] = replacements.get("(DISTRICT)", "").upper()
-        computed["(CURRENT_DATE)"] = DocumentProcessor.get_formatted_current_date()
-        
-        # Calculate total amount
+            return f"and {ares2} of property comprised in Sy.No. {syno2}"
+        return ""
+    
+    @staticmethod
+    def _total_amount(*amounts: str) -> str:
+        """Calculate total amount"""
         try:
-            amount1 = int((replacements.get("(AMNT1)", "0") or "0").replace(",", ""))
-            amount2 = int((replacements.get("(AMNT2)", "0") or "0").replace(",", ""))
-            amount3 = int((replacements.get("(AMNT3)", "0") or "0").replace(",", ""))
-            computed["(TOTAL_AMOUNT)"] = DocumentProcessor.format_number_indian(str(amount1 + amount2 + amount3))
+            total = sum(int((amount or "0").replace(",", "")) for amount in amounts)
+            return DocumentProcessor.format_number_indian(str(total))
         except (ValueError, TypeError):
-            computed["(TOTAL_AMOUNT)"] = "0"
             logger.warning("Failed to calculate total amount")
-        
-        computed["(ESTABLISHMENT)"] = replacements.get("(ESTABLISHMENT)").upper()
-        
-        return computed
+            return "0"
+
+# Computed placeholders and the form placeholders they are derived from. They are only
+# evaluated when a template being rendered contains them, and at most once per request.
+COMPUTED_FIELDS = (
+    ComputedField(
+        "(CAUSE_OF_ACTION)",
+        ("(DATE1)", "(COA_DATE1)", "(COA_AMNT1)", "(VILLAGE)", "(TALUK)"),
+        FormDataProcessor._cause_of_action,
+    ),
+    ComputedField("(ARES2)", ("(ARES2)", "(SYNO2)"), FormDataProcessor._ares2_clause),
+    ComputedField("(DISTRICT)", ("(DISTRICT)",), str.upper),
+    ComputedField("(CURRENT_DATE)", (), DocumentProcessor.get_formatted_current_date),
+    ComputedField("(TOTAL_AMOUNT)", ("(AMNT1)", "(AMNT2)", "(AMNT3)"), FormDataProcessor._total_amount),
+    ComputedField("(ESTABLISHMENT)", ("(ESTABLISHMENT)",), str.upper),
+)
+
+# Every placeholder a render can fill; anything else in parentheses is literal template text
+PLACEHOLDERS = frozenset(
+    [spec.placeholder for spec in FIELD_SCHEMA.fields]
+    + [computed.placeholder for computed in COMPUTED_FIELDS]
+    + ["(PETITIONER_ADDRESS)"]
+)
 
 # Initialize Flask app at module level (CRITICAL for Vercel)
 app = Flask(__name__)
@@ -279,34 +425,173 @@ app = Flask(__name__)
 # Initialize configuration
 config = AppConfig()
 
-# Initialize S3 client with error handling
+# The S3 client, storage, document processor and output cache are created on first use (see
+# get_doc_processor), so a cold start that only serves the form or /health never loads boto3
 s3_client = None
-try:
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.getenv('AWS_REGION', 'us-east-1')
-    )
-    logger.info("S3 client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize S3 client: {e}")
-
-# Initialize processors
+storage = None
 doc_processor = None
+output_cache = None
+archive_queue = None
+_s3_client_attempted = False
+_startup_lock = threading.RLock()
+
 form_processor = FormDataProcessor()
+document_executor = ThreadPoolExecutor(max_workers=config.max_workers, thread_name_prefix="document")
+job_manager = JobManager(
+    create_job_store(config.job_store, config.job_db_path, config.job_max_jobs, config.job_retention),
+    ThreadPoolExecutor(max_workers=config.job_workers, thread_name_prefix="job"),
+)
+template_registry = TemplateRegistry(
+    config.templates, config.render_mode, config.template_render_modes, PLACEHOLDERS,
+    base_dir=os.path.dirname(os.path.abspath(__file__)),
+)
+submission_log = SubmissionLog(config.submission_log_size)
+
+def get_s3_client():
+    """Return the shared S3 client, creating it on first use; None if it could not be created
+
+    boto3 clients are thread-safe, so one client with a connection pool sized
+    for every worker thread is shared by the whole process and, on Vercel,
+    reused by every invocation a warm instance serves.
+    """
+    global s3_client, _s3_client_attempted
+    if _s3_client_attempted:
+        return s3_client
+    
+    with _startup_lock:
+        if not _s3_client_attempted:
+            try:
+                import boto3
+                from botocore.config import Config
+                
+                s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                    region_name=os.getenv('AWS_REGION', 'us-east-1'),
+                    config=Config(
+                        max_pool_connections=config.s3_pool_size,
+                        retries={"mode": config.s3_retry_mode, "total_max_attempts": config.s3_max_attempts},
+                        connect_timeout=config.s3_connect_timeout,
+                        read_timeout=config.s3_read_timeout,
+                    ),
+                )
+                logger.info(f"S3 client initialized successfully ({config.s3_pool_size} pooled connections)")
+            except Exception as e:
+                logger.error(f"Failed to initialize S3 client: {e}")
+            _s3_client_attempted = True
+    return s3_client
 
-if s3_client:
-    doc_processor = DocumentProcessor(s3_client, config.bucket_name)
+def build_transfer_config():
+    """TransferConfig for uploads through upload_fileobj, using the client's connection pool"""
+    from boto3.s3.transfer import TransferConfig
+    
+    return TransferConfig(
+        multipart_threshold=config.s3_multipart_threshold,
+        multipart_chunksize=config.s3_multipart_chunksize,
+        max_concurrency=config.s3_transfer_concurrency,
+        use_threads=config.s3_transfer_concurrency > 1,
+    )
+
+def get_storage():
+    """Return the configured storage backend, creating it on first use; None if S3 is unavailable"""
+    global storage
+    if storage is not None:
+        return storage
+    
+    with _startup_lock:
+        if storage is None:
+            # Only the S3 backend needs a client, so local and memory storage never import boto3
+            client = get_s3_client() if config.storage_backend == "s3" else None
+            storage = create_storage(
+                config.storage_backend, client, config.bucket_name, config.local_storage_root, config.local_storage_url,
+                transfer_config=build_transfer_config() if client is not None else None,
+            )
+    return storage
+
+def build_output_cache(shared_storage=None, writer: Optional[ArchiveQueue] = None) -> Optional[OutputCache]:
+    """Create the rendered-output cache from the configuration, or None when it is disabled"""
+    if config.output_cache_bytes <= 0:
+        return None
+    return OutputCache(
+        config.output_cache_bytes,
+        storage=shared_storage if config.output_cache_s3 else None,
+        prefix=config.output_cache_prefix,
+        writer=writer,
+    )
+
+def get_doc_processor() -> Optional[DocumentProcessor]:
+    """Return the shared document processor, creating it on first use; None without storage"""
+    global doc_processor, output_cache, archive_queue
+    if doc_processor is not None:
+        return doc_processor
+    
+    backend = get_storage()
+    if backend is None:
+        return None
+    with _startup_lock:
+        if doc_processor is None:
+            if config.archive_mode == "background":
+                archive_queue = ArchiveQueue(
+                    backend,
+                    config.archive_spool_dir,
+                    max_pending=config.archive_queue_size,
+                    workers=config.archive_workers,
+                    retries=config.archive_retries,
+                )
+            output_cache = build_output_cache(backend, archive_queue)
+            doc_processor = DocumentProcessor(backend, template_registry, output_cache, archive_queue)
+    return doc_processor
+
+def warm_up() -> None:
+    """Parse and index every template now instead of on first use
+
+    Safe to call in a pre-fork master (see gunicorn.conf.py): it touches no
+    sockets or storage, so forked workers share the loaded templates
+    copy-on-write.
+    """
+    template_registry.warm()
+
+# "eager" builds everything at import, for long-running servers that prefer paying up front;
+# "warm" only preloads the templates, which is what a pre-forking server should use
+if config.startup_mode == "eager":
+    warm_up()
+    get_doc_processor()
+elif config.startup_mode == "warm":
+    warm_up()
+
+def presigned_response(output_path: str, filename: str):
+    """Redirect to (or return as JSON) a presigned URL for a stored file; None if one can't be made"""
+    try:
+        url = storage.presign(output_path, filename, config.presigned_url_expiry)
+    except Exception as e:
+        logger.error(f"Failed to create presigned URL for {output_path}: {e}")
+        return None
+    if not url:
+        return None
+    
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"url": url, "filename": filename, "expires_in": config.presigned_url_expiry})
+    return redirect(url, code=302)
+
+def deliver_file(content: bytes, output_path: str, filename: str, stored: bool):
+    """Send a generated file to the client, either directly or through a presigned S3 URL"""
+    if config.delivery_mode == "presigned" and stored:
+        response = presigned_response(output_path, filename)
+        if response is not None:
+            return response
+    
+    # Fall back to serving the bytes from memory
+    return serve_bytes_as_attachment(content, filename)
 
 @app.route("/", methods=["GET"])
 def form():
     """Main page render"""
     try:
         if request.method == "GET":
-            if not FIELDS:
+            if not FIELD_SCHEMA:
                 return jsonify({"error": "Form fields not configured"}), 500
-            return render_template("form.html", fields=FIELDS)
+            return render_template("form.html", fields=FIELD_SCHEMA.fields)
 
     except Exception as e:
         logger.error(f"Form processing error: {e}")
@@ -317,7 +602,7 @@ def download_document(doc_type):
     """Handle document download"""
     try:
         # Check if services are available
-        if not s3_client or not doc_processor:
+        if not get_doc_processor():
             return jsonify({"error": "Service temporarily unavailable"}), 503
             
         # Check if document type exists
@@ -335,14 +620,7 @@ def download_document(doc_type):
         replacements = form_processor.build_replacements(form_data)
         
         # Handle petitioner address
-        if request.form.get('petitioner_address_checker') == 'on':
-            village = replacements.get("(VILLAGE)", "")
-            taluk = replacements.get("(TALUK)", "")
-            district = replacements.get("(DISTRICT)", "")
-            pincode = replacements.get("(PINCODE)", "")
-            replacements["(PETITIONER_ADDRESS)"] = f"{village} Village, {taluk} Taluk, {district} District. PIN -{pincode}"
-        else:
-            replacements["(PETITIONER_ADDRESS)"] = ""
+        form_processor.add_petitioner_address(replacements, request.form.get('petitioner_address_checker') == 'on')
         
         # Generate output filename and path for document
         output_filename = f"{doc_processor.get_custom_datetime_format()}_{doc_type}_output.docx"
@@ -350,23 +628,100 @@ def download_document(doc_type):
         
         # Process document
         template_path = config.templates[doc_type]
-        if not doc_processor.process_docx(template_path, replacements, output_path):
+        file_content = doc_processor.render_document(template_path, replacements)
+        if file_content is None:
             return jsonify({"error": "Document processing failed"}), 500
         
-        # Serve file
-        return serve_s3_file_as_attachment(s3_client, config.bucket_name, output_path, output_filename)
+        # A presigned URL needs the object in storage before the response goes out; otherwise the
+        # copy is archived after the rendered bytes have been sent
+        if config.delivery_mode != "presigned":
+            doc_processor.archive_document(file_content, output_path)
+            return serve_bytes_as_attachment(file_content, output_filename)
+        
+        stored = doc_processor.store_document(file_content, output_path)
+        if not stored:
+            logger.warning(f"{doc_type} was not persisted to S3")
+        return deliver_file(file_content, output_path, output_filename, stored)
         
     except Exception as e:
         logger.error(f"Document processing error: {e}")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+def generate_document(doc_type: str, template_path: str, replacements: Dict[str, str],
+                      datetime_stamp: str, on_done=None, store: bool = True):
+    """Render one document and persist it to S3 unless `store` is off; runs on the worker pool"""
+    output_filename = f"{datetime_stamp}_{doc_type}_output.docx"
+    output_path = f"{config.output_prefix}{output_filename}"
+    
+    # Process document
+    file_content = doc_processor.render_document(template_path, replacements)
+    if on_done is not None:
+        on_done(doc_type, file_content is not None)
+    if file_content is None:
+        logger.error(f"Failed to process document type: {doc_type}")
+        return None
+    
+    # The zip is built from the rendered bytes, so the copy in storage can be archived in the background
+    if store:
+        doc_processor.archive_document(file_content, output_path)
+    return output_filename, file_content
+
+def document_succeeded(future) -> bool:
+    """Whether a generate_document future produced a document"""
+    try:
+        return future.result() is not None
+    except Exception:
+        return False
+
+def iter_documents_zip(futures: Dict[str, Any], uploader=None, archive_path: Optional[str] = None):
+    """Yield a zip of finished documents piece by piece, in configuration order
+
+    Each document is dropped as soon as it has been written, and every byte is
+    also fed to `uploader` when one is given. With `archive_path` the finished
+    zip is handed to archive_document instead. Either way storage is only
+    finished after the last piece has been yielded, so the client never waits
+    on it.
+    """
+    archive_buffer = io.BytesIO() if archive_path else None
+    sink = ChunkSink(*(mirror for mirror in (uploader, archive_buffer) if mirror is not None))
+    writer = ZipStreamWriter(sink)
+    date_time = datetime.now().timetuple()[:6]
+    finished = False
+    try:
+        for doc_type in list(futures):
+            future = futures.pop(doc_type)
+            try:
+                result = future.result()
+            except Exception as doc_error:
+                logger.error(f"Error processing {doc_type}: {doc_error}")
+                continue
+            if result is None:
+                continue
+            
+            output_filename, file_content = result
+            writer.writestr(output_filename, file_content, date_time)
+            logger.info(f"Added {doc_type} to zip file")
+            yield sink.drain()
+        
+        writer.close()
+        yield sink.drain()
+        if uploader is not None:
+            uploader.close()
+        if archive_buffer is not None:
+            doc_processor.archive_document(archive_buffer.getvalue(), archive_path)
+        finished = True
+    finally:
+        # A client that disconnects mid-download must not leave a truncated archive in S3
+        if uploader is not None and not finished:
+            uploader.abort()
+
 # Download all from S3 for serving the zip file
 @app.route("/download-all-documents-s3", methods=["POST"])
 def download_all_documents_s3():
     """Handle download of all documents as a zip file (served from S3)"""
     try:
         # Check if services are available
-        if not s3_client or not doc_processor:
+        if not get_doc_processor():
             return jsonify({"error": "Service temporarily unavailable"}), 503
         
         form_data = request.form.to_dict()
@@ -380,83 +735,304 @@ def download_all_documents_s3():
         replacements = form_processor.build_replacements(form_data)
         
         # Handle petitioner address
-        if request.form.get('petitioner_address_checker') == 'on':
-            village = replacements.get("(VILLAGE)", "")
-            taluk = replacements.get("(TALUK)", "")
-            district = replacements.get("(DISTRICT)", "")
-            pincode = replacements.get("(PINCODE)", "")
-            replacements["(PETITIONER_ADDRESS)"] = f"{village} Village, {taluk} Taluk, {district} District. PIN -{pincode}"
+        form_processor.add_petitioner_address(replacements, request.form.get('petitioner_address_checker') == 'on')
+        
+        datetime_stamp = doc_processor.get_custom_datetime_format()
+        
+        # Generate all documents concurrently
+        futures = {
+            doc_type: document_executor.submit(
+                generate_document, doc_type, template_path, replacements, datetime_stamp
+            )
+            for doc_type, template_path in config.templates.items()
+        }
+        
+        # Sent back as previous_submission to /regenerate-changed after the form is edited
+        headers = {"X-Submission-Id": submission_log.record(replacements)}
+        return documents_zip_response(futures, datetime_stamp, headers)
+        
+    except Exception as e:
+        logger.error(f"Download all documents error: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+@app.route("/regenerate-changed", methods=["POST"])
+def regenerate_changed_documents():
+    """Download All again after an edit, re-rendering only templates whose placeholders changed"""
+    try:
+        # Check if services are available
+        if not get_doc_processor():
+            return jsonify({"error": "Service temporarily unavailable"}), 503
+        
+        form_data = request.form.to_dict()
+        previous_key = request.form.get('previous_submission') or request.args.get('previous_submission')
+        
+        # Validate form data
+        if not form_processor.validate_form_data(form_data):
+            return jsonify({"error": "Missing required form fields"}), 400
+        
+        replacements = form_processor.build_replacements(form_data)
+        form_processor.add_petitioner_address(replacements, request.form.get('petitioner_address_checker') == 'on')
+        
+        # An unknown or evicted previous submission means everything counts as changed
+        previous = submission_log.get(previous_key) if previous_key else None
+        if previous is None:
+            changed = list(config.templates)
         else:
-            replacements["(PETITIONER_ADDRESS)"] = ""
+            changed = template_registry.templates_using(changed_placeholders(previous, replacements))
+        logger.info(f"Regenerating changed documents: {', '.join(changed) or 'none'}")
         
-        # Create in-memory zip file
-        zip_buffer = io.BytesIO()
+        # Unchanged templates render to the same cache key as before, so they come from the output
+        # cache and their earlier S3 copies are not uploaded again
         datetime_stamp = doc_processor.get_custom_datetime_format()
+        futures = {
+            doc_type: document_executor.submit(
+                generate_document, doc_type, template_path, replacements, datetime_stamp,
+                store=doc_type in changed,
+            )
+            for doc_type, template_path in config.templates.items()
+        }
         
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            processed_docs = []
-            failed_docs = []
-            
-            # Process each document type
-            for doc_type, template_path in config.templates.items():
-                try:
-                    # Generate output filename and path for this document
-                    output_filename = f"{datetime_stamp}_{doc_type}_output.docx"
-                    output_path = f"{config.output_prefix}{output_filename}"
-                    
-                    # Process document
-                    if doc_processor.process_docx(template_path, replacements, output_path):
-                        # Download the processed file from S3
-                        try:
-                            response = s3_client.get_object(Bucket=config.bucket_name, Key=output_path)
-                            file_content = response['Body'].read()
-                            
-                            # Add to zip file
-                            zip_file.writestr(output_filename, file_content)
-                            processed_docs.append(doc_type)
-                            logger.info(f"Added {doc_type} to zip file")
-                            
-                        except Exception as s3_error:
-                            logger.error(f"Failed to retrieve {doc_type} from S3: {s3_error}")
-                            failed_docs.append(doc_type)
-                    else:
-                        logger.error(f"Failed to process document type: {doc_type}")
-                        failed_docs.append(doc_type)
-                        
-                except Exception as doc_error:
-                    logger.error(f"Error processing {doc_type}: {doc_error}")
-                    failed_docs.append(doc_type)
-        
-        # Check if any documents were processed
-        if not processed_docs:
-            return jsonify({"error": "Failed to process any documents"}), 500
-        
-        # Upload zip file to S3
+        headers = {
+            "X-Submission-Id": submission_log.record(replacements),
+            "X-Regenerated-Templates": ",".join(changed),
+        }
+        return documents_zip_response(futures, datetime_stamp, headers)
+        
+    except Exception as e:
+        logger.error(f"Regenerate changed documents error: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+def documents_zip_response(futures: Dict[str, Any], datetime_stamp: str, headers: Dict[str, str]):
+    """Build the Download All response for a set of generate_document futures"""
+    # Check if any documents were processed (waits only until the first success)
+    if not any(document_succeeded(future) for future in futures.values()):
+        return jsonify({"error": "Failed to process any documents"}), 500
+    
+    zip_filename = f"{datetime_stamp}_all_documents.zip"
+    zip_path = f"{config.output_prefix}{zip_filename}"
+    
+    if config.delivery_mode == "presigned":
+        # The browser fetches from S3, so the archive only has to reach the bucket
+        uploader = storage.open_writer(zip_path, 'application/zip')
+        for _ in iter_documents_zip(dict(futures), uploader):
+            pass
+        response = presigned_response(zip_path, zip_filename) if uploader.completed else None
+        if response is not None:
+            response.headers.update(headers)
+            return response
+    
+    # Stream the zip to the client; the copy is archived once the last byte has been sent
+    chunks = iter_documents_zip(futures, archive_path=zip_path)
+    response = Response(stream_with_context(chunks), mimetype="application/zip")
+    response.headers.set("Content-Disposition", "attachment", filename=zip_filename)
+    response.headers.update(headers)
+    return response
+
+def get_bulk_upload():
+    """Return the binary stream and record format of a bulk upload"""
+    # Accept either a multipart upload named "records" or the raw request body
+    upload = request.files.get("records")
+    if upload is not None:
+        stream, filename, content_type = upload.stream, upload.filename, upload.content_type
+    else:
+        stream, filename, content_type = request.stream, "", request.content_type
+    return stream, request.args.get("format") or detect_format(filename, content_type)
+
+@app.route("/bulk-generate/template.csv", methods=["GET"])
+def bulk_template():
+    """Empty CSV whose header row lists every column /bulk-generate understands"""
+    columns = FIELD_SCHEMA.names + ["petitioner_address_checker"]
+    response = Response(",".join(columns) + "\r\n", mimetype="text/csv")
+    response.headers.set("Content-Disposition", "attachment", filename="bulk_template.csv")
+    return response
+
+@app.route("/bulk-generate", methods=["POST"])
+def bulk_generate():
+    """Generate every document for each record of a CSV or JSONL upload, streamed back as one zip"""
+    try:
+        # Check if services are available
+        if not get_doc_processor():
+            return jsonify({"error": "Service temporarily unavailable"}), 503
+        
+        stream, record_format = get_bulk_upload()
+        if record_format not in BULK_FORMATS:
+            return jsonify({"error": f"Unsupported format '{record_format}'"}), 400
+        
+        logger.info(f"Processing bulk generation request ({record_format})")
+        records = read_records(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""), record_format)
+        generator = BulkGenerator(doc_processor, form_processor, config.templates, document_executor, config.max_workers)
+        
+        zip_filename = f"{doc_processor.get_custom_datetime_format()}_bulk_documents.zip"
+        response = Response(stream_with_context(generator.iter_zip(records)), mimetype="application/zip")
+        response.headers.set("Content-Disposition", "attachment", filename=zip_filename)
+        return response
+        
+    except Exception as e:
+        logger.error(f"Bulk generation error: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+def jobs_disabled_response(alternative: str):
+    """Error for job routes on deployments that can't run background work"""
+    return jsonify({
+        "error": "Background jobs are not available on this deployment",
+        "alternative": alternative,
+    }), 501
+
+@app.route("/jobs/download-all", methods=["POST"])
+def enqueue_download_all():
+    """Queue generation of all documents as a zip and return a job id immediately"""
+    if not config.jobs_enabled:
+        return jobs_disabled_response("/download-all-documents-s3")
+    try:
+        # Check if services are available
+        if not get_doc_processor():
+            return jsonify({"error": "Service temporarily unavailable"}), 503
+        
+        form_data = request.form.to_dict()
+        if not form_processor.validate_form_data(form_data):
+            return jsonify({"error": "Missing required form fields"}), 400
+        
+        replacements = form_processor.build_replacements(form_data)
+        form_processor.add_petitioner_address(replacements, request.form.get('petitioner_address_checker') == 'on')
+        datetime_stamp = doc_processor.get_custom_datetime_format()
         zip_filename = f"{datetime_stamp}_all_documents.zip"
-        zip_s3_path = f"{config.output_prefix}{zip_filename}"
+        zip_path = f"{config.output_prefix}{zip_filename}"
         
-        s3_client.put_object(
-            Bucket=config.bucket_name,
-            Key=zip_s3_path,
-            Body=zip_buffer.getvalue(),
-            ContentType='application/zip'
-        )
+        def work(progress):
+            def on_done(doc_type, succeeded):
+                progress.update(doc_type, "done" if succeeded else "failed")
+            
+            futures = {
+                doc_type: document_executor.submit(
+                    generate_document, doc_type, template_path, replacements, datetime_stamp, on_done
+                )
+                for doc_type, template_path in config.templates.items()
+            }
+            if not any(document_succeeded(future) for future in futures.values()):
+                raise RuntimeError("Failed to process any documents")
+            
+            uploader = storage.open_writer(zip_path, 'application/zip')
+            for _ in iter_documents_zip(futures, uploader):
+                pass
+            if not uploader.completed:
+                raise RuntimeError("Failed to store the zip file")
+            return zip_path, zip_filename
         
-        # Serve zip file from S3
-        return serve_s3_file_as_attachment(s3_client, config.bucket_name, zip_s3_path, zip_filename)
+        job = job_manager.submit("download-all", work, {doc_type: "pending" for doc_type in config.templates})
+        return job_accepted_response(job)
         
     except Exception as e:
-        logger.error(f"Download all documents error: {e}")
+        logger.error(f"Job submission error: {e}")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+@app.route("/jobs/bulk-generate", methods=["POST"])
+def enqueue_bulk_generate():
+    """Queue a bulk generation and return a job id immediately"""
+    if not config.jobs_enabled:
+        return jobs_disabled_response("/bulk-generate")
+    try:
+        # Check if services are available
+        if not get_doc_processor():
+            return jsonify({"error": "Service temporarily unavailable"}), 503
+        
+        stream, record_format = get_bulk_upload()
+        if record_format not in BULK_FORMATS:
+            return jsonify({"error": f"Unsupported format '{record_format}'"}), 400
+        
+        # The upload only lives as long as the request, so spool it for the worker
+        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{record_format}") as spool:
+            shutil.copyfileobj(stream, spool)
+            spool_path = spool.name
+        
+        zip_filename = f"{doc_processor.get_custom_datetime_format()}_bulk_documents.zip"
+        zip_path = f"{config.output_prefix}{zip_filename}"
+        
+        def work(progress):
+            def on_document(doc_type, succeeded):
+                progress.increment(doc_type, "done" if succeeded else "failed")
+            
+            generator = BulkGenerator(
+                doc_processor, form_processor, config.templates, document_executor, config.max_workers, on_document
+            )
+            uploader = storage.open_writer(zip_path, 'application/zip')
+            try:
+                with open(spool_path, newline="", encoding="utf-8-sig") as records_file:
+                    for chunk in generator.iter_zip(read_records(records_file, record_format)):
+                        uploader.write(chunk)
+                if not uploader.close():
+                    raise RuntimeError("Failed to store the zip file")
+            except Exception:
+                uploader.abort()
+                raise
+            finally:
+                os.remove(spool_path)
+            return zip_path, zip_filename
+        
+        job = job_manager.submit("bulk-generate", work)
+        return job_accepted_response(job)
+        
+    except Exception as e:
+        logger.error(f"Job submission error: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+def job_accepted_response(job):
+    """202 response pointing the client at the job's status URL"""
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for("job_status", job_id=job.id),
+    }), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Report a job's state, per-template progress and, once done, where to get the result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found"}), 404
+    
+    payload = job.to_dict()
+    if job.status == JOB_DONE and job.result_key:
+        payload["download_url"] = url_for("download_job_result", job_id=job.id)
+        try:
+            result_url = get_storage().presign(job.result_key, job.result_filename, config.presigned_url_expiry)
+            if result_url:
+                payload["result_url"] = result_url
+        except Exception as e:
+            logger.warning(f"Failed to create presigned URL for job {job.id}: {e}")
+    return jsonify(payload)
+
+@app.route("/jobs/<job_id>/download", methods=["GET"])
+def download_job_result(job_id):
+    """Stream a finished job's result from storage"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found"}), 404
+    if job.status != JOB_DONE or not job.result_key:
+        return jsonify({"error": f"Job '{job_id}' is {job.status}"}), 409
+    if not get_storage():
+        return jsonify({"error": "Service temporarily unavailable"}), 503
+    try:
+        chunks, content_length = storage.stream(job.result_key)
+    except FileNotFoundError:
+        return jsonify({"error": f"Result of job '{job_id}' is no longer available"}), 410
+    return serve_stream_as_attachment(chunks, job.result_filename, content_length)
+
 @app.route("/health")
 def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
-        "s3_available": s3_client is not None,
-        "fields_loaded": len(FIELDS) > 0,
+        # None until the S3 client has been attempted, which happens on first use (see get_s3_client)
+        "s3_available": (s3_client is not None) if _s3_client_attempted else None,
+        "storage_backend": config.storage_backend,
+        # False until the first request that needs storage has set it up
+        "storage_ready": storage is not None,
+        "fields_loaded": len(FIELD_SCHEMA) > 0,
         "templates_configured": len(config.templates),
+        "output_cache": output_cache.stats() if output_cache else None,
+        "archive": archive_queue.stats() if archive_queue else None,
+        "templates_warm": template_registry.is_warm,
+        "templates": template_registry.status(),
         "timestamp": datetime.now().isoformat()
     })
 
@@ -472,14 +1048,16 @@ def debug_info():
         },
         "file_structure": {
             "files_in_directory": os.listdir('.'),
-            "template_file_exists": os.path.exists(config.template_file),
-            "template_files": {name: os.path.exists(path) for name, path in config.templates.items()}
+            "template_file_exists": os.path.exists(template_registry.resolve(config.template_file)),
+            "template_files": {name: os.path.exists(template_registry.resolve(path)) for name, path in config.templates.items()}
         },
         "services": {
             "s3_client": s3_client is not None,
+            "storage": storage.name if storage is not None else None,
             "doc_processor": doc_processor is not None,
-            "fields_count": len(FIELDS)
-        }
+            "fields_count": len(FIELD_SCHEMA)
+        },
+        "template_placeholders": template_registry.placeholder_report()
     })
 
 @app.errorhandler(400)
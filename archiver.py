@@ -0,0 +1,190 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SPOOL_SUFFIX = ".spool"
+
+
+@dataclass
+class ArchiveItem:
+    """A document waiting to be written to storage"""
+    key: str
+    content: bytes
+    content_type: Optional[str] = None
+    attempts: int = 0
+    # Set once the item has a spool file, which is removed when the item is archived
+    spool_path: Optional[str] = None
+
+
+class ArchiveQueue:
+    """Write-behind archival of generated documents
+
+    submit() returns at once and background threads put the bytes into
+    storage, retrying with exponential backoff. The queue is bounded: when it
+    is full, or an item runs out of retries, the item is written to a local
+    spool directory instead. Items still queued or uploading when the process
+    exits are spooled too. Spooled items are queued again the next time an
+    ArchiveQueue starts on the same directory and their files are deleted
+    only once they have been archived.
+    """
+
+    def __init__(self, storage, spool_dir: str, max_pending: int = 256, workers: int = 2,
+                 retries: int = 3, backoff: float = 0.5):
+        self.storage = storage
+        self.spool_dir = spool_dir
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self._queue: "queue.Queue[ArchiveItem]" = queue.Queue(maxsize=max(1, max_pending))
+        self._in_flight: Dict[int, ArchiveItem] = {}
+        # Reentrant because close() spools in-flight items while holding it
+        self._lock = threading.RLock()
+        self._closed = False
+        self.archived = 0
+        self.spooled = 0
+
+        self._threads: List[threading.Thread] = []
+        for index in range(max(1, workers)):
+            thread = threading.Thread(target=self._work, name=f"archive-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.close)
+        self._replay_spool()
+
+    def submit(self, key: str, content: bytes, content_type: Optional[str] = None) -> None:
+        """Queue a document for archival; never blocks and never raises into the request"""
+        item = ArchiveItem(key, content, content_type)
+        if self._closed:
+            self._spool(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning(f"Archive queue full, spooling {key} to disk")
+            self._spool(item)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for the health endpoint"""
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {
+            "pending": self._queue.qsize(),
+            "in_flight": in_flight,
+            "archived": self.archived,
+            "spooled": self.spooled,
+        }
+
+    def close(self) -> None:
+        """Stop accepting work and spool everything that has not reached storage yet"""
+        if self._closed:
+            return
+        self._closed = True
+        pending = []
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for item in pending:
+            self._spool(item)
+        # Uploads in progress carry on; holding the lock means each one either finishes first and is
+        # skipped here, or is spooled here and its spool file is removed when the upload succeeds
+        with self._lock:
+            in_flight = list(self._in_flight.values())
+            for item in in_flight:
+                self._spool(item)
+        pending.extend(in_flight)
+        if pending:
+            logger.info(f"Spooled {len(pending)} unarchived documents to {self.spool_dir}")
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if self._closed:
+                self._spool(item)
+                continue
+            with self._lock:
+                self._in_flight[id(item)] = item
+            try:
+                self._archive(item)
+            finally:
+                with self._lock:
+                    self._in_flight.pop(id(item), None)
+
+    def _archive(self, item: ArchiveItem) -> None:
+        while True:
+            item.attempts += 1
+            try:
+                self.storage.put(item.key, item.content, item.content_type)
+                with self._lock:
+                    self.archived += 1
+                    self._in_flight.pop(id(item), None)
+                    spool_path = item.spool_path
+                if spool_path:
+                    self._remove_spool_file(spool_path)
+                logger.info(f"Document archived: {item.key}")
+                return
+            except Exception as e:
+                if item.attempts >= self.retries or self._closed:
+                    logger.error(f"Archiving {item.key} failed after {item.attempts} attempts, spooling: {e}")
+                    self._spool(item)
+                    return
+                logger.warning(f"Archiving {item.key} failed (attempt {item.attempts}), retrying: {e}")
+                time.sleep(self.backoff * 2 ** (item.attempts - 1))
+
+    def _spool(self, item: ArchiveItem) -> None:
+        """Write an item to the spool directory: a JSON header line followed by the content"""
+        if item.spool_path:
+            return
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}{_SPOOL_SUFFIX}")
+            header = json.dumps({"key": item.key, "content_type": item.content_type}).encode("utf-8")
+            with open(path + ".tmp", "wb") as spool_file:
+                spool_file.write(header + b"\n" + item.content)
+            os.replace(path + ".tmp", path)
+            with self._lock:
+                item.spool_path = path
+                self.spooled += 1
+        except OSError as e:
+            logger.error(f"Failed to spool {item.key}, it will not be archived: {e}")
+
+    @staticmethod
+    def _remove_spool_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _replay_spool(self) -> None:
+        """Queue documents spooled by an earlier process"""
+        if not os.path.isdir(self.spool_dir):
+            return
+        replayed = 0
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.endswith(_SPOOL_SUFFIX):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                with open(path, "rb") as spool_file:
+                    header, content = spool_file.read().split(b"\n", 1)
+                metadata = json.loads(header)
+                self._queue.put_nowait(ArchiveItem(
+                    metadata["key"], content, metadata.get("content_type"), spool_path=path,
+                ))
+            except queue.Full:
+                break
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Unreadable spool file {path}: {e}")
+                continue
+            replayed += 1
+        if replayed:
+            logger.info(f"Re-queued {replayed} spooled documents for archival")
@@ -0,0 +1,58 @@
+import logging
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def map_unique(convert: Callable[[str], str], values: Sequence[str]) -> List[str]:
+    """Apply `convert` to a column of values, calling it once per distinct value
+
+    Bulk columns repeat a lot (dates, districts, standard amounts), so each
+    distinct value is formatted once and the result reused for every row.
+    """
+    results: Dict[str, str] = {}
+    converted = []
+    for value in values:
+        result = results.get(value)
+        if result is None:
+            result = results[value] = str(convert(value))
+        converted.append(result)
+    return converted
+
+
+def parse_amount(value: str) -> int:
+    """Parse an amount that may carry Indian digit grouping, treating blanks as zero"""
+    return int((value or "0").replace(",", ""))
+
+
+def sum_columns(*columns: Sequence[str]) -> List[Optional[int]]:
+    """Row-wise sum of amount columns; None for rows with a value that is not a number"""
+    row_count = len(columns[0]) if columns else 0
+    parse = {}
+    valid = [True] * row_count
+    parsed_columns = []
+    for column in columns:
+        parsed = []
+        for row, value in enumerate(column):
+            amount = parse.get(value)
+            if amount is None:
+                try:
+                    amount = parse[value] = parse_amount(value)
+                except (ValueError, TypeError, AttributeError):
+                    amount = 0
+                    valid[row] = False
+            parsed.append(amount)
+        parsed_columns.append(parsed)
+
+    totals = [sum(amounts) for amounts in zip(*parsed_columns)] if parsed_columns else [0] * row_count
+
+    return [total if ok else None for total, ok in zip(totals, valid)]
+
+
+def format_totals(format_number: Callable[[str], str], *columns: Sequence[str]) -> List[str]:
+    """Row-wise totals of amount columns formatted with `format_number`, "0" where a row can't be summed"""
+    totals = sum_columns(*columns)
+    failed = totals.count(None)
+    if failed:
+        logger.warning(f"Failed to calculate total amount for {failed} rows")
+    return map_unique(format_number, ["0" if total is None else str(total) for total in totals])
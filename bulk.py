@@ -0,0 +1,225 @@
+import argparse
+import csv
+import json
+import logging
+import re
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from zip_writer import ChunkSink, ZipStreamWriter
+
+logger = logging.getLogger(__name__)
+
+BULK_FORMATS = ("csv", "jsonl")
+
+# Values accepted as "on" for the petitioner address checkbox column
+_CHECKED_VALUES = ("on", "true", "yes", "1")
+
+
+def detect_format(filename: str = "", content_type: str = "") -> str:
+    """Guess whether an upload is CSV or JSONL from its name or content type"""
+    filename = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if filename.endswith((".jsonl", ".ndjson")) or "ndjson" in content_type or "jsonl" in content_type:
+        return "jsonl"
+    return "csv"
+
+
+def read_records(text_stream, record_format: str) -> Iterator[Dict[str, Any]]:
+    """Yield one dict of form values per CSV row or JSONL line, reading lazily"""
+    if record_format == "jsonl":
+        for line_number, line in enumerate(text_stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_number} is not valid JSON: {e}") from e
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {line_number} is not a JSON object")
+            yield {key: "" if value is None else str(value) for key, value in record.items()}
+    elif record_format == "csv":
+        reader = csv.DictReader(text_stream)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                raise ValueError(f"Unreadable CSV input: {e}") from e
+            yield {key.strip(): (value or "").strip() for key, value in row.items() if key}
+    else:
+        raise ValueError(f"Unsupported bulk format: {record_format}")
+
+
+def safe_name(value: str, fallback: str = "petitioner") -> str:
+    """Make a value usable as a folder name inside the zip"""
+    cleaned = re.sub(r"[^A-Za-z0-9._-]+", "_", value or "").strip("._")
+    return cleaned[:60] or fallback
+
+
+class BulkGenerator:
+    """Renders every template for each record and streams the results as one zip
+
+    Records are read lazily and at most `window` of them are in flight at a
+    time, so memory stays bounded no matter how many rows the input has.
+    """
+
+    def __init__(self, doc_processor, form_processor, templates: Dict[str, str], executor, window: int = 8,
+                 on_document: Optional[Callable[[str, bool], None]] = None, batch_size: int = 256):
+        self.doc_processor = doc_processor
+        self.form_processor = form_processor
+        self.templates = templates
+        self.executor = executor
+        self.window = max(1, window)
+        # Called with (doc_type, succeeded) for every document of every valid record
+        self.on_document = on_document
+        # Records are validated and formatted this many at a time, column by column
+        self.batch_size = max(1, batch_size)
+        # (row_number, message) for every problem of the last iter_zip run, as written to errors.txt
+        self.errors: List[Tuple[int, str]] = []
+
+    def iter_zip(self, records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+        """Yield the bytes of a zip with one folder per petitioner, as it is produced"""
+        sink = ChunkSink()
+        writer = ZipStreamWriter(sink)
+        date_time = datetime.now().timetuple()[:6]
+        errors: List[Tuple[int, str]] = []
+        self.errors = errors
+        in_flight = deque()
+
+        for row_number, record, prepared in self._prepare(records, errors):
+            in_flight.append((row_number, record, self._submit(prepared)))
+            if len(in_flight) >= self.window:
+                self._write_record(writer, errors, date_time, *in_flight.popleft())
+                yield sink.drain()
+
+        while in_flight:
+            self._write_record(writer, errors, date_time, *in_flight.popleft())
+            yield sink.drain()
+
+        if errors:
+            errors.sort(key=lambda error: error[0])
+            report = "".join(f"row {row_number}: {message}\n" for row_number, message in errors)
+            writer.writestr("errors.txt", report.encode("utf-8"), date_time)
+        writer.close()
+        yield sink.drain()
+
+    def _prepare(self, records: Iterable[Dict[str, Any]], errors: List[Tuple[int, str]]):
+        """Yield (row_number, record, replacements or error message) for each record, a batch at a time"""
+        records = iter(records)
+        row_number = 0
+        exhausted = False
+        while not exhausted:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(next(records))
+                except StopIteration:
+                    exhausted = True
+                    break
+                except ValueError as e:
+                    # Unreadable input ends the batch, but everything read so far is still delivered
+                    errors.append((row_number + len(batch) + 1, str(e)))
+                    exhausted = True
+                    break
+
+            for (offset, record), prepared in zip(enumerate(batch, start=row_number + 1), self._build_batch(batch)):
+                yield offset, record, prepared
+            row_number += len(batch)
+
+    def _build_batch(self, batch: List[Dict[str, Any]]) -> List[Any]:
+        """Validate a batch of records and build the replacements of the valid ones in one pass"""
+        prepared: List[Any] = []
+        valid = []
+        for record in batch:
+            missing_fields = self.form_processor.get_missing_fields(record)
+            if missing_fields:
+                prepared.append(f"missing required fields: {', '.join(missing_fields)}")
+                continue
+            field_errors = self.form_processor.get_field_errors(record)
+            if field_errors:
+                prepared.append("invalid fields: " + ", ".join(f"{name} {message}" for name, message in field_errors.items()))
+                continue
+            valid.append(len(prepared))
+            prepared.append(None)
+
+        try:
+            built = self.form_processor.build_replacements_batch([batch[index] for index in valid])
+        except Exception as e:
+            # Fall back to one record at a time so a single bad row only fails itself
+            logger.warning(f"Batch formatting failed, formatting records one by one: {e}")
+            built = []
+            for index in valid:
+                try:
+                    built.append(self.form_processor.build_replacements(batch[index]))
+                except Exception as record_error:
+                    built.append(f"invalid record: {record_error}")
+
+        for index, replacements in zip(valid, built):
+            if not isinstance(replacements, str):
+                checked = str(batch[index].get("petitioner_address_checker", "")).strip().lower() in _CHECKED_VALUES
+                self.form_processor.add_petitioner_address(replacements, checked)
+            prepared[index] = replacements
+        return prepared
+
+    def _submit(self, replacements):
+        """Queue the documents of a prepared record; returns futures or the record's error message"""
+        if isinstance(replacements, str):
+            return replacements
+
+        return {
+            doc_type: self.executor.submit(self.doc_processor.render_document, template_path, replacements)
+            for doc_type, template_path in self.templates.items()
+        }
+
+    def _write_record(self, writer: ZipStreamWriter, errors: List[Tuple[int, str]], date_time,
+                      row_number: int, record: Dict[str, Any], futures) -> None:
+        if isinstance(futures, str):
+            errors.append((row_number, futures))
+            return
+
+        folder = f"{row_number:05d}_{safe_name(record.get('petitioner', ''))}"
+        for doc_type, future in futures.items():
+            try:
+                content = future.result()
+            except Exception as e:
+                logger.error(f"Bulk row {row_number}: {doc_type} failed: {e}")
+                content = None
+            if self.on_document is not None:
+                self.on_document(doc_type, content is not None)
+            if content is None:
+                errors.append((row_number, f"failed to render {doc_type}"))
+                continue
+            writer.writestr(f"{folder}/{doc_type}.docx", content, date_time)
+
+
+def main(argv=None) -> int:
+    """Command-line entry point: python bulk.py records.csv all_petitions.zip"""
+    parser = argparse.ArgumentParser(description="Generate every document for each record of a CSV or JSONL file")
+    parser.add_argument("input", help="CSV or JSONL file with one petition per row, keyed by form field names")
+    parser.add_argument("output", help="Path of the zip file to write")
+    parser.add_argument("--format", choices=BULK_FORMATS, help="Input format (default: from the file extension)")
+    args = parser.parse_args(argv)
+
+    from app import DocumentProcessor, build_output_cache, config, document_executor, form_processor, template_registry
+
+    doc_processor = DocumentProcessor(None, template_registry, build_output_cache())
+    generator = BulkGenerator(doc_processor, form_processor, config.templates, document_executor, config.max_workers)
+    record_format = args.format or detect_format(args.input)
+
+    with open(args.input, newline="", encoding="utf-8-sig") as input_file, open(args.output, "wb") as output_file:
+        for chunk in generator.iter_zip(read_records(input_file, record_format)):
+            output_file.write(chunk)
+
+    if generator.errors:
+        logger.error(f"Bulk archive written to {args.output} with {len(generator.errors)} errors, see errors.txt")
+        return 1
+    logger.info(f"Bulk archive written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,279 @@
+import io
+import re
+from typing import Dict, List, Tuple
+
+from lxml import etree
+
+from zip_writer import ZipMember, ZipStreamWriter
+
+W_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+NAMESPACES = {"w": W_NAMESPACE}
+
+MAIN_DOCUMENT_PART = "word/document.xml"
+
+# Same parser settings python-docx uses, so element paths match between the two renderers
+XML_PARSER = etree.XMLParser(remove_blank_text=True, resolve_entities=False)
+
+
+def w(tag: str) -> str:
+    """Return the Clark-notation name of a WordprocessingML tag"""
+    return f"{{{W_NAMESPACE}}}{tag}"
+
+
+def parse_part(blob: bytes):
+    """Parse an XML package part"""
+    return etree.fromstring(blob, XML_PARSER)
+
+
+def serialize_part(root) -> bytes:
+    """Serialize an XML package part the way python-docx writes it"""
+    return etree.tostring(root, encoding="UTF-8", standalone=True)
+
+
+def _run_child_text(element) -> str:
+    tag = element.tag
+    if tag == w("t"):
+        return element.text or ""
+    if tag in (w("tab"), w("ptab")):
+        return "\t"
+    if tag == w("cr"):
+        return "\n"
+    if tag == w("br"):
+        return "\n" if element.get(w("type"), "textWrapping") == "textWrapping" else ""
+    if tag == w("noBreakHyphen"):
+        return "-"
+    return ""
+
+
+def run_text(run) -> str:
+    """Text of a w:r element, with tabs and breaks translated like python-docx"""
+    return "".join(_run_child_text(child) for child in run)
+
+
+def paragraph_text(paragraph) -> str:
+    """Text of a w:p element, including runs nested in hyperlinks"""
+    parts = []
+    for child in paragraph:
+        if child.tag == w("r"):
+            parts.append(run_text(child))
+        elif child.tag == w("hyperlink"):
+            parts.extend(run_text(run) for run in child.iterchildren(w("r")))
+    return "".join(parts)
+
+
+def _on_off(element) -> bool:
+    return element.get(w("val"), "true") not in ("0", "false", "off")
+
+
+def _base_run_properties(run) -> etree._Element:
+    """Build the rPr python-docx writes when it copies the font of `run` onto a new run"""
+    source = run.find(w("rPr"))
+    properties = etree.Element(w("rPr"))
+    if source is None:
+        return properties
+
+    fonts = source.find(w("rFonts"))
+    if fonts is not None and fonts.get(w("ascii")) is not None:
+        name = fonts.get(w("ascii"))
+        etree.SubElement(properties, w("rFonts"), {w("ascii"): name, w("hAnsi"): name})
+
+    for tag in ("b", "i"):
+        element = source.find(w(tag))
+        if element is not None:
+            new_element = etree.SubElement(properties, w(tag))
+            if not _on_off(element):
+                new_element.set(w("val"), "0")
+
+    color = source.find(w("color"))
+    if color is not None and color.get(w("val")) not in (None, "auto"):
+        etree.SubElement(properties, w("color"), {w("val"): color.get(w("val")).upper()})
+
+    size = source.find(w("sz"))
+    if size is not None and size.get(w("val")) is not None:
+        etree.SubElement(properties, w("sz"), {w("val"): size.get(w("val"))})
+
+    underline = source.find(w("u"))
+    if underline is not None and underline.get(w("val")) is not None:
+        etree.SubElement(properties, w("u"), {w("val"): underline.get(w("val"))})
+
+    return properties
+
+
+def _append_run(paragraph, text: str, properties=None) -> None:
+    """Append a w:r holding `text`, mapping tabs and newlines to w:tab and w:br"""
+    run = etree.SubElement(paragraph, w("r"))
+    if properties is not None:
+        run.append(properties)
+
+    for index, chunk in enumerate(re.split(r"([\t\r\n])", text)):
+        if index % 2:
+            etree.SubElement(run, w("tab") if chunk == "\t" else w("br"))
+        elif chunk:
+            text_element = etree.SubElement(run, w("t"))
+            text_element.text = chunk
+            if len(chunk.strip()) < len(chunk):
+                text_element.set(f"{{{XML_NAMESPACE}}}space", "preserve")
+
+
+def rewrite_paragraph(paragraph, text: str) -> None:
+    """Replace the content of a w:p with a single run, keeping the first run's font
+
+    Only used when a placeholder cannot be mapped onto w:t text.
+    """
+    runs = paragraph.findall(w("r"))
+    if not runs:
+        _append_run(paragraph, text)
+        return
+
+    properties = _base_run_properties(runs[0])
+    for child in list(paragraph):
+        if child.tag != w("pPr"):
+            paragraph.remove(child)
+    _append_run(paragraph, text, properties)
+
+
+def _text_segments(paragraph) -> List[Tuple[etree._Element, int, int]]:
+    """Map every run child of a w:p to the span of paragraph_text() it produces"""
+    segments = []
+    offset = 0
+    for child in paragraph:
+        if child.tag == w("r"):
+            runs = [child]
+        elif child.tag == w("hyperlink"):
+            runs = child.findall(w("r"))
+        else:
+            continue
+        for run in runs:
+            for element in run:
+                length = len(_run_child_text(element))
+                if length:
+                    segments.append((element, offset, offset + length))
+                    offset += length
+    return segments
+
+
+def _set_text(text_element, text: str) -> None:
+    text_element.text = text
+    if len(text.strip()) < len(text):
+        text_element.set(f"{{{XML_NAMESPACE}}}space", "preserve")
+
+
+def _remove_text(text_element) -> None:
+    """Drop a w:t, and its run too when nothing but run properties would be left"""
+    run = text_element.getparent()
+    run.remove(text_element)
+    if all(child.tag == w("rPr") for child in run):
+        run.getparent().remove(run)
+
+
+def _splice(segments: List[Tuple[etree._Element, int, int]], start: int, end: int, value: str) -> bool:
+    """Put `value` in place of paragraph text [start, end), touching only the runs that cover it
+
+    The first w:t of the span takes the value and every other covered w:t
+    loses its share, so each run keeps its own formatting. Returns False when
+    the span covers something other than w:t text, e.g. a tab.
+    """
+    covered = [segment for segment in segments if segment[1] < end and segment[2] > start]
+    if any(element.tag != w("t") for element, _, _ in covered):
+        return False
+
+    first, first_start, _ = covered[0]
+    last, last_start, _ = covered[-1]
+    before = first.text[:start - first_start]
+    after = last.text[end - last_start:]
+    if last is not first:
+        # Text after the token stays in its own run, with that run's formatting
+        for element, _, _ in covered[1:-1]:
+            _remove_text(element)
+        if after:
+            _set_text(last, after)
+        else:
+            _remove_text(last)
+        after = ""
+
+    # Tabs and line breaks in the value become w:tab and w:br inside the same run
+    pieces = re.split(r"([\t\r\n])", value)
+    pieces[-1] += after
+    _set_text(first, before + pieces[0])
+    anchor = first
+    for index in range(1, len(pieces), 2):
+        separator = etree.Element(w("tab") if pieces[index] == "\t" else w("br"))
+        anchor.addnext(separator)
+        anchor = separator
+        if pieces[index + 1]:
+            text_element = etree.Element(w("t"))
+            _set_text(text_element, pieces[index + 1])
+            anchor.addnext(text_element)
+            anchor = text_element
+    if not first.text and len(pieces) > 1:
+        first.getparent().remove(first)
+    return True
+
+
+def normalize_part(root, pattern: "re.Pattern[str]") -> int:
+    """Clean a story part in place so every placeholder sits in a single w:t
+
+    Spell-check markers (w:proofErr) and revision ids (w:rsid*) are stripped,
+    then tokens Word split across runs are merged into the run they start in.
+    Returns how many split tokens were merged.
+    """
+    for proof_error in list(root.iter(w("proofErr"))):
+        proof_error.getparent().remove(proof_error)
+    for element in root.iter(tag=etree.Element):
+        for name in [name for name in element.attrib if name.startswith(w("rsid"))]:
+            del element.attrib[name]
+
+    merged = 0
+    for paragraph in root.iter(w("p")):
+        matches = list(pattern.finditer(paragraph_text(paragraph)))
+        if not matches:
+            continue
+        segments = _text_segments(paragraph)
+        for match in reversed(matches):
+            covered = [segment for segment in segments if segment[1] < match.end() and segment[2] > match.start()]
+            if len(covered) > 1 and _splice(segments, match.start(), match.end(), match.group(0)):
+                merged += 1
+    return merged
+
+
+def replace_in_paragraph(paragraph, replacements: Dict[str, str], pattern: "re.Pattern[str]") -> bool:
+    """Substitute placeholders in a w:p; return whether the paragraph changed
+
+    Placeholders are matched against the paragraph text and each match is
+    written into the runs it spans, including tokens Word split across runs,
+    so untouched runs and their formatting are left exactly as they were.
+    """
+    full_text = paragraph_text(paragraph)
+    matches = [
+        match for match in pattern.finditer(full_text)
+        if str(replacements[match.group(0)]) != match.group(0)
+    ]
+    if not matches:
+        return False
+
+    segments = _text_segments(paragraph)
+    # Last match first, so the offsets of earlier matches stay valid
+    for match in reversed(matches):
+        if not _splice(segments, match.start(), match.end(), str(replacements[match.group(0)])):
+            modified_text = pattern.sub(lambda m: str(replacements[m.group(0)]), full_text)
+            rewrite_paragraph(paragraph, modified_text)
+            break
+    return True
+
+
+def write_package(members: List[ZipMember], replaced_parts: Dict[str, bytes]) -> bytes:
+    """Write a copy of a template package with some parts swapped out
+
+    Unchanged parts are copied as the template's compressed bytes; only the
+    replaced parts are deflated again.
+    """
+    output = io.BytesIO()
+    with ZipStreamWriter(output) as writer:
+        for member in members:
+            blob = replaced_parts.get(member.filename)
+            if blob is None:
+                writer.write_member(member)
+            else:
+                writer.writestr(member.filename, blob, member.date_time)
+    return output.getvalue()
@@ -0,0 +1,135 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from batch_format import map_unique
+
+logger = logging.getLogger(__name__)
+
+Converter = Callable[[str], str]
+# A validator returns an error message for a bad value, or None when the value is fine
+Validator = Callable[[str], Optional[str]]
+
+# Form widget used for each datatype in form.html
+INPUT_TYPES = {
+    "text": "text",
+    "uppercase": "text",
+    "number": "number",
+    "date": "date",
+    "textarea": "textarea",
+}
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """One form field, compiled from its FIELDS entry"""
+    name: str
+    label: str
+    placeholder: str
+    datatype: str
+    required: bool
+    default: str
+    convert: Converter
+    validators: Tuple[Validator, ...]
+
+    @property
+    def input_type(self) -> str:
+        """Widget form.html renders for this field"""
+        return INPUT_TYPES.get(self.datatype, "text")
+
+
+def required_validator(value: str) -> Optional[str]:
+    return None if value else "is required"
+
+
+def pattern_validator(pattern: str) -> Validator:
+    """Build a validator accepting empty values or values matching `pattern` in full"""
+    compiled = re.compile(pattern)
+
+    def validate(value: str) -> Optional[str]:
+        if value and not compiled.fullmatch(value):
+            return f"does not match {pattern}"
+        return None
+
+    return validate
+
+
+class FieldSchema:
+    """The form fields compiled once, so each request is a single pass over prebuilt converters"""
+
+    def __init__(self, fields: Iterable[FieldSpec]):
+        self.fields: Tuple[FieldSpec, ...] = tuple(fields)
+        self.required: Tuple[str, ...] = tuple(spec.name for spec in self.fields if spec.required)
+        self._converters = tuple((spec.name, spec.placeholder, spec.convert) for spec in self.fields)
+        self._validators = tuple((spec.name, spec.validators) for spec in self.fields if spec.validators)
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    @property
+    def names(self) -> List[str]:
+        """Form field names in display order, which are also the bulk input columns"""
+        return [spec.name for spec in self.fields]
+
+    def missing(self, data: Dict[str, Any]) -> List[str]:
+        """Names of required fields that are empty"""
+        return [name for name in self.required if not data.get(name)]
+
+    def errors(self, data: Dict[str, Any]) -> Dict[str, str]:
+        """Validation messages by field name; empty when every field is valid"""
+        errors = {}
+        for name, validators in self._validators:
+            value = str(data.get(name, "") or "")
+            for validator in validators:
+                message = validator(value)
+                if message:
+                    errors[name] = message
+                    break
+        return errors
+
+    def convert(self, data: Dict[str, Any]) -> Dict[str, str]:
+        """Map form values to their placeholders, formatted for the documents"""
+        return {
+            placeholder: str(convert(data.get(name, "")))
+            for name, placeholder, convert in self._converters
+        }
+
+    def convert_batch(self, records: Sequence[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """convert() for many records at once, column by column, formatting each distinct value once"""
+        rows: List[Dict[str, str]] = [{} for _ in records]
+        for name, placeholder, convert in self._converters:
+            column = map_unique(convert, [record.get(name, "") for record in records])
+            for row, value in zip(rows, column):
+                row[placeholder] = value
+        return rows
+
+
+def compile_schema(fields: Iterable[Dict[str, Any]], converters: Dict[str, Converter]) -> FieldSchema:
+    """Compile FIELDS-style dicts into a FieldSchema, picking each field's converter by datatype"""
+    specs = []
+    for field in fields:
+        datatype = (field.get("datatype") or "text").strip()
+        convert = converters.get(datatype)
+        if convert is None:
+            logger.warning(f"Unknown datatype '{datatype}' for field {field['name']}, treating it as text")
+            convert = converters.get("text", str)
+
+        required = bool(field.get("required", False))
+        validators: List[Validator] = []
+        if required:
+            validators.append(required_validator)
+        if field.get("pattern"):
+            validators.append(pattern_validator(field["pattern"]))
+
+        specs.append(FieldSpec(
+            name=field["name"],
+            label=field.get("label", field["name"]),
+            placeholder=field["placeholder"],
+            datatype=datatype,
+            required=required,
+            default=field.get("default", ""),
+            convert=convert,
+            validators=tuple(validators),
+        ))
+    return FieldSchema(specs)
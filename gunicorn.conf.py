@@ -0,0 +1,25 @@
+# gunicorn -c gunicorn.conf.py app:app
+import gc
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Job status has to be readable from whichever worker a poll lands on, so keep it in SQLite
+if workers > 1:
+    os.environ.setdefault("JOB_STORE", "sqlite")
+
+# Import the app in the master so templates parsed there are shared with every worker
+preload_app = True
+
+
+def when_ready(server):
+    """Warm the templates in the master, after the app is loaded and before workers fork"""
+    import app
+
+    app.warm_up()
+    # Keep the loaded templates out of the collector so workers don't dirty the shared pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Templates warm: {app.template_registry.is_warm}")
@@ -0,0 +1,183 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import closing
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """A queued or finished generation request"""
+    id: str
+    kind: str
+    status: str = JOB_QUEUED
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result_key: Optional[str] = None
+    result_filename: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class MemoryJobStore:
+    """Keeps jobs in a dict; state is lost when the process exits
+
+    Only the process that accepted a job can report on it, so this store is
+    for single-process servers. Finished jobs are forgotten `retention`
+    seconds after they finished, or sooner, oldest first, once more than
+    `max_jobs` are kept; queued and running jobs are never dropped.
+    """
+
+    def __init__(self, max_jobs: int = 1024, retention: float = 3600):
+        self.max_jobs = max(1, max_jobs)
+        self.retention = retention
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, job: Job) -> None:
+        with self._lock:
+            job.updated_at = time.time()
+            self._jobs[job.id] = Job(**job.to_dict())
+            self._jobs.move_to_end(job.id)
+            self._evict(job.updated_at)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return Job(**job.to_dict()) if job else None
+
+    def _evict(self, now: float) -> None:
+        finished = [job for job in self._jobs.values() if job.status in (JOB_DONE, JOB_FAILED)]
+        excess = len(self._jobs) - self.max_jobs
+        # Jobs are kept in order of their last update, so the oldest finished ones come first
+        for job in finished:
+            if excess <= 0 and now - job.updated_at < self.retention:
+                break
+            del self._jobs[job.id]
+            excess -= 1
+
+
+class SQLiteJobStore:
+    """Keeps jobs in a local SQLite file so status survives restarts and is shared between workers"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT, status TEXT, progress TEXT, result_key TEXT, "
+                "result_filename TEXT, error TEXT, created_at REAL, updated_at REAL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(self, job: Job) -> None:
+        job.updated_at = time.time()
+        with self._lock, closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, job.status, json.dumps(job.progress), job.result_key,
+                 job.result_filename, job.error, job.created_at, job.updated_at),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock, closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT id, kind, status, progress, result_key, result_filename, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Job(
+            id=row[0], kind=row[1], status=row[2], progress=json.loads(row[3] or "{}"),
+            result_key=row[4], result_filename=row[5], error=row[6], created_at=row[7], updated_at=row[8],
+        )
+
+
+class JobProgress:
+    """Handle given to a running job for reporting progress"""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        self._manager = manager
+        self._job = job
+        self._lock = threading.Lock()
+
+    def update(self, key: str, value: Any) -> None:
+        """Set one progress entry, e.g. a template's status"""
+        with self._lock:
+            self._job.progress[key] = value
+            self._manager.store.save(self._job)
+
+    def increment(self, key: str, counter: str) -> None:
+        """Bump a named counter under a progress entry"""
+        with self._lock:
+            entry = self._job.progress.setdefault(key, {})
+            entry[counter] = entry.get(counter, 0) + 1
+            self._manager.store.save(self._job)
+
+
+# A job body receives its progress handle and returns (result_key, result_filename)
+JobFunction = Callable[[JobProgress], Tuple[str, str]]
+
+
+class JobManager:
+    """Queues generation jobs on an executor and records their state in a store
+
+    Any object with a ThreadPoolExecutor-style submit() can serve as the
+    executor, and any object with save()/get() as the store.
+    """
+
+    def __init__(self, store, executor):
+        self.store = store
+        self.executor = executor
+
+    def submit(self, kind: str, work: JobFunction, progress: Optional[Dict[str, Any]] = None) -> Job:
+        """Record a new job and queue it; returns immediately"""
+        job = Job(id=uuid.uuid4().hex, kind=kind, progress=dict(progress or {}))
+        self.store.save(job)
+        self.executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def _run(self, job: Job, work: JobFunction) -> None:
+        job.status = JOB_RUNNING
+        self.store.save(job)
+        progress = JobProgress(self, job)
+        try:
+            job.result_key, job.result_filename = work(progress)
+            job.status = JOB_DONE
+            logger.info(f"Job {job.id} ({job.kind}) finished")
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+        self.store.save(job)
+
+
+def create_job_store(backend: str, path: str, max_jobs: int = 1024, retention: float = 3600):
+    """Build the configured job store"""
+    if backend == "sqlite":
+        return SQLiteJobStore(path)
+    if backend != "memory":
+        logger.warning(f"Unknown job store '{backend}', using memory")
+    return MemoryJobStore(max_jobs, retention)
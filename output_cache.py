@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(template_version: str, replacements: Dict[str, str],
+                   placeholders: Optional[Iterable[str]] = None) -> str:
+    """Hash a template version and its replacement values into a content address
+
+    When `placeholders` is given only those keys are hashed, since values for
+    placeholders a template does not contain cannot change its output.
+    """
+    if placeholders is not None:
+        replacements = {key: replacements[key] for key in placeholders if key in replacements}
+    normalized = json.dumps(
+        {key: str(value) for key, value in replacements.items()},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    digest = hashlib.sha256()
+    digest.update(template_version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalized.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def make_submission_key(replacements: Dict[str, str]) -> str:
+    """Hash a complete set of replacement values into a submission id"""
+    return make_cache_key("submission", replacements)
+
+
+class SubmissionLog:
+    """Replacement values of the most recent submissions, by submission key"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, replacements: Dict[str, str]) -> str:
+        """Remember a submission and return its key"""
+        key = make_submission_key(replacements)
+        if self.max_entries <= 0:
+            return key
+        with self._lock:
+            self._entries[key] = {name: str(value) for name, value in replacements.items()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Return the values of an earlier submission, or None if it is unknown or was evicted"""
+        with self._lock:
+            return self._entries.get(key)
+
+
+def changed_placeholders(previous: Dict[str, str], current: Dict[str, str]) -> Set[str]:
+    """Placeholders whose value differs between two submissions"""
+    return {
+        key for key in set(previous) | set(current)
+        if str(previous.get(key, "")) != str(current.get(key, ""))
+    }
+
+
+class OutputCache:
+    """Rendered documents by content key: an in-process LRU bounded by bytes, optionally backed by storage
+
+    `storage` is any backend from storage.py; with S3 it makes the cache
+    shared between workers and deployments. Every in-memory miss then costs a
+    storage GET on the request path. Writes to storage go through `writer`
+    when one is given (an ArchiveQueue), so a render never waits on a PUT.
+    """
+
+    def __init__(self, max_bytes: int, storage=None, prefix: str = "/cache/", writer=None):
+        self.max_bytes = max_bytes
+        self.storage = storage
+        self.prefix = prefix
+        self.writer = writer
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self) -> int:
+        """Bytes currently held in memory"""
+        return self._size
+
+    def storage_key(self, key: str) -> str:
+        """Object key of a cache entry in the storage tier"""
+        return f"{self.prefix}{key}.docx"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached bytes for a key, checking memory first and then storage"""
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return content
+
+        content = self._get_from_storage(key)
+        with self._lock:
+            if content is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._put_in_memory(key, content)
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        """Store rendered bytes under a key in every configured tier"""
+        self._put_in_memory(key, content)
+        self._put_to_storage(key, content)
+
+    def clear(self) -> None:
+        """Drop every in-memory entry"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for the health endpoint"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _put_in_memory(self, key: str, content: bytes) -> None:
+        if len(content) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = content
+            self._size += len(content)
+
+            # Evict least recently used entries until we are back under budget
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _get_from_storage(self, key: str) -> Optional[bytes]:
+        if not self.storage:
+            return None
+        try:
+            return self.storage.get(self.storage_key(key))
+        except Exception:
+            return None
+
+    def _put_to_storage(self, key: str, content: bytes) -> None:
+        if not self.storage:
+            return
+        if self.writer is not None:
+            self.writer.submit(self.storage_key(key), content)
+            return
+        try:
+            self.storage.put(self.storage_key(key), content)
+        except Exception as e:
+            logger.warning(f"Failed to write cache entry {key} to storage: {e}")
@@ -0,0 +1,70 @@
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, MutableMapping, Tuple
+
+
+@dataclass(frozen=True)
+class ComputedField:
+    """A placeholder whose value is derived from the values of other placeholders"""
+    placeholder: str
+    inputs: Tuple[str, ...]
+    derive: Callable[..., str]
+
+
+class LazyReplacements(MutableMapping):
+    """Replacement values where computed fields are only derived when first read
+
+    Behaves like the plain dict of placeholder -> value the renderers expect.
+    Computed fields take their inputs from the form values, each is derived at
+    most once per instance (also across worker threads), and a computed field
+    shadows a form value of the same placeholder. Assigning to a computed
+    placeholder overrides its derivation.
+    """
+
+    def __init__(self, values: Dict[str, str], computed: Iterable[ComputedField] = ()):
+        self._values = dict(values)
+        self._computed = {field.placeholder: field for field in computed}
+        self._resolved: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> str:
+        resolved = self._resolved.get(key)
+        if resolved is not None:
+            return resolved
+
+        field = self._computed.get(key)
+        if field is None:
+            return self._values[key]
+
+        with self._lock:
+            if key not in self._resolved:
+                inputs = [self._values.get(name, "") for name in field.inputs]
+                self._resolved[key] = str(field.derive(*inputs))
+            return self._resolved[key]
+
+    def __setitem__(self, key: str, value: str) -> None:
+        if key in self._computed:
+            with self._lock:
+                self._resolved[key] = value
+        else:
+            self._values[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        with self._lock:
+            self._values.pop(key, None)
+            self._computed.pop(key, None)
+            self._resolved.pop(key, None)
+
+    def __contains__(self, key) -> bool:
+        return key in self._values or key in self._computed
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._values
+        for key in self._computed:
+            if key not in self._values:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._values) + sum(1 for key in self._computed if key not in self._values)
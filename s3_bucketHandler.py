@@ -1,55 +1,184 @@
-from flask import Flask, render_template, request, send_file, make_response
-import tempfile
+from flask import Response, send_file
+import io
+import logging
 import os
 
-def serve_s3_file_as_attachment(s3, bucket_name, s3_path, download_filename=None):
+logger = logging.getLogger(__name__)
+
+# Size of the pieces an S3 object body is relayed to the client in
+STREAM_CHUNK_SIZE = 64 * 1024
+
+MIME_TYPES = {
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.pdf': 'application/pdf',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.csv': 'text/csv',
+    '.txt': 'text/plain',
+    '.zip': 'application/zip',
+    # Add more MIME types as needed
+}
+
+def get_mime_type(filename):
+    """Determine MIME type based on file extension"""
+    file_ext = os.path.splitext(filename)[1].lower()
+    return MIME_TYPES.get(file_ext, 'application/octet-stream')
+
+def serve_bytes_as_attachment(content, download_filename):
     """
-    Download a file from S3 and serve it as an attachment to the user.
-    
+    Serve an in-memory file as an attachment to the user.
+
     Args:
-        s3_path (str): Path to the file in S3, without leading slash
-        download_filename (str, optional): Filename to use for the download.
-            If not provided, uses the filename from s3_path.
-    
+        content (bytes): The file contents
+        download_filename (str): Filename to use for the download
+
     Returns:
         Flask response object with file attachment
     """
-    
-    # Use the provided filename or extract from s3_path
-    if download_filename is None:
-        download_filename = os.path.basename(s3_path)
-    
-    # Create a temporary file to store the downloaded document
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(download_filename)[1]) as temp_file:
-        temp_path = temp_file.name
-    
-    # Download the file from S3
-    s3.download_file(bucket_name, s3_path, temp_path)
-    
-    # Determine MIME type based on file extension
-    mime_types = {
-        '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        '.pdf': 'application/pdf',
-        '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        '.csv': 'text/csv',
-        '.txt': 'text/plain',
-        # Add more MIME types as needed
-    }
-    file_ext = os.path.splitext(download_filename)[1].lower()
-    mime_type = mime_types.get(file_ext, 'application/octet-stream')
-    
-    # Send the file to the user as an attachment
-    response = make_response(send_file(
-        temp_path,
-        mimetype=mime_type,
+    return send_file(
+        io.BytesIO(content),
+        mimetype=get_mime_type(download_filename),
         as_attachment=True,
         download_name=download_filename
-    ))
-    
-    # Clean up the temporary file after the response is sent
-    @response.call_on_close
-    def cleanup():
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-    
+    )
+
+def serve_stream_as_attachment(chunks, download_filename, content_length=None):
+    """
+    Serve an iterator of byte chunks as an attachment to the user.
+
+    Args:
+        chunks (iterable): The file contents, piece by piece
+        download_filename (str): Filename to use for the download
+        content_length (int, optional): Total size, sent as Content-Length when known
+
+    Returns:
+        Flask response object with file attachment
+    """
+    response = Response(chunks, mimetype=get_mime_type(download_filename))
+    response.headers.set('Content-Disposition', 'attachment', filename=download_filename)
+    if content_length is not None:
+        response.headers['Content-Length'] = str(content_length)
+
     return response
+
+def generate_presigned_download_url(s3, bucket_name, s3_path, download_filename=None, expires_in=300):
+    """
+    Create a short-lived presigned GET URL that downloads an S3 object as an attachment.
+
+    Args:
+        s3_path (str): Path to the file in S3, without leading slash
+        download_filename (str, optional): Filename the browser should save as.
+            If not provided, uses the filename from s3_path.
+        expires_in (int): Lifetime of the URL in seconds
+
+    Returns:
+        The presigned URL
+    """
+    if download_filename is None:
+        download_filename = os.path.basename(s3_path)
+
+    return s3.generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': bucket_name,
+            'Key': s3_path,
+            'ResponseContentDisposition': f'attachment; filename="{download_filename}"',
+            'ResponseContentType': get_mime_type(download_filename),
+        },
+        ExpiresIn=expires_in
+    )
+
+class S3StreamingUpload:
+    """
+    File-like writer that uploads an object to S3 as it is produced.
+
+    Bytes are buffered until they reach the S3 minimum part size and then sent
+    as a multipart upload part, so at most one part is held in memory. Objects
+    that never fill a part are sent with a single put_object on close(). S3
+    errors are logged and stop the upload; they never raise into the caller,
+    which keeps whatever else is consuming the same bytes unaffected.
+    """
+
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, s3, bucket_name, s3_path, content_type='application/octet-stream'):
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.s3_path = s3_path
+        self.content_type = content_type
+        self.completed = False
+        self.failed = False
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    def write(self, data):
+        if self.failed:
+            return
+        self._buffer.extend(data)
+        if len(self._buffer) >= self.MIN_PART_SIZE:
+            self._upload_part()
+
+    def close(self):
+        """Finish the upload; returns whether the object is now in S3"""
+        if self.failed or self.completed:
+            return self.completed
+        try:
+            if self._upload_id is None:
+                self.s3.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.s3_path,
+                    Body=bytes(self._buffer),
+                    ContentType=self.content_type
+                )
+            else:
+                if self._buffer:
+                    self._upload_part()
+                if self.failed:
+                    return False
+                self.s3.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self.s3_path,
+                    UploadId=self._upload_id,
+                    MultipartUpload={'Parts': self._parts}
+                )
+            self.completed = True
+        except Exception as e:
+            logger.error(f"Failed to upload {self.s3_path} to S3: {e}")
+            self.abort()
+        finally:
+            self._buffer = bytearray()
+        return self.completed
+
+    def abort(self):
+        """Give up on the upload and discard any parts already sent"""
+        self.failed = True
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            try:
+                self.s3.abort_multipart_upload(Bucket=self.bucket_name, Key=self.s3_path, UploadId=self._upload_id)
+            except Exception as e:
+                logger.warning(f"Failed to abort multipart upload of {self.s3_path}: {e}")
+            self._upload_id = None
+
+    def _upload_part(self):
+        try:
+            if self._upload_id is None:
+                response = self.s3.create_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self.s3_path,
+                    ContentType=self.content_type
+                )
+                self._upload_id = response['UploadId']
+            part_number = len(self._parts) + 1
+            response = self.s3.upload_part(
+                Bucket=self.bucket_name,
+                Key=self.s3_path,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=bytes(self._buffer)
+            )
+            self._parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+            self._buffer = bytearray()
+        except Exception as e:
+            logger.error(f"Failed to upload part of {self.s3_path} to S3: {e}")
+            self.abort()
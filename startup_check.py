@@ -0,0 +1,64 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Modules that must not be imported just by importing app; they load on the first render or S3 call
+DEFERRED_MODULES = ("boto3", "botocore", "docx", "numpy")
+
+DEFAULT_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "250"))
+
+
+def measure_import(module: str = "app") -> Tuple[Dict[str, int], List[str]]:
+    """Import `module` in a fresh interpreter under -X importtime
+
+    Returns the cumulative import time in microseconds of every module, and
+    which of DEFERRED_MODULES ended up loaded anyway.
+    """
+    probe = (
+        f"import sys, {module}; "
+        f"print(','.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = [part.strip() for part in line[len("import time:"):].split("|")]
+        if len(fields) == 3 and fields[1].isdigit():
+            timings[fields[2]] = int(fields[1])
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return timings, loaded
+
+
+def main(argv=None) -> int:
+    """Command-line entry point: python startup_check.py [--budget-ms 250]"""
+    parser = argparse.ArgumentParser(description="Check the cold-start import time of the app against a budget")
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS, help="Allowed import time of app")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    args = parser.parse_args(argv)
+
+    timings, loaded = measure_import()
+    total_ms = timings.get("app", 0) / 1000
+    print(f"import app: {total_ms:.1f} ms (budget {args.budget_ms} ms)")
+    for name, microseconds in sorted(timings.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+        print(f"  {microseconds / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: loaded at import time: {', '.join(loaded)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
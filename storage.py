@@ -0,0 +1,254 @@
+import io
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from s3_bucketHandler import STREAM_CHUNK_SIZE, S3StreamingUpload, generate_presigned_download_url
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ("s3", "local", "memory")
+
+# Every backend offers the same operations on string keys such as "/output/<file>.docx":
+#   put(key, content, content_type=None)      store bytes, raising on failure
+#   get(key) -> bytes                         raise FileNotFoundError when the key is absent
+#   stream(key) -> (chunks, content_length)   read without holding the whole object
+#   exists(key) -> bool
+#   presign(key, filename, expires_in)        a URL the browser can fetch directly, or None
+#   open_writer(key, content_type)            file-like writer with close() -> bool and abort()
+
+
+def _is_missing(error: Exception) -> bool:
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return isinstance(error, KeyError) or code in ("NoSuchKey", "404", "NotFound")
+
+
+class S3Storage:
+    """Objects in an S3 bucket"""
+
+    name = "s3"
+
+    def __init__(self, client, bucket_name: str, transfer_config=None):
+        self.client = client
+        self.bucket_name = bucket_name
+        # boto3.s3.transfer.TransferConfig for upload_fileobj; None uses boto3's defaults
+        self.transfer_config = transfer_config
+
+    def put(self, key: str, content: bytes, content_type: Optional[str] = None) -> None:
+        extra_args = {"ContentType": content_type} if content_type else None
+        self.client.upload_fileobj(
+            io.BytesIO(content), self.bucket_name, key, ExtraArgs=extra_args, Config=self.transfer_config
+        )
+
+    def get(self, key: str) -> bytes:
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=key)
+        except Exception as e:
+            if _is_missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+        return response['Body'].read()
+
+    def stream(self, key: str) -> Tuple[Iterator[bytes], Optional[int]]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=key)
+        except Exception as e:
+            if _is_missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+        body = response['Body']
+
+        def generate():
+            try:
+                for chunk in body.iter_chunks(chunk_size=STREAM_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                body.close()
+
+        return generate(), response.get('ContentLength')
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except Exception as e:
+            if _is_missing(e):
+                return False
+            raise
+
+    def presign(self, key: str, filename: Optional[str] = None, expires_in: int = 300) -> Optional[str]:
+        return generate_presigned_download_url(self.client, self.bucket_name, key, filename, expires_in)
+
+    def open_writer(self, key: str, content_type: str = 'application/octet-stream') -> S3StreamingUpload:
+        return S3StreamingUpload(self.client, self.bucket_name, key, content_type)
+
+
+class _LocalFileWriter:
+    """Writes to a temporary file next to the target and moves it into place on close()"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed = False
+        self.failed = False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, self._temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        self._file = os.fdopen(descriptor, "wb")
+
+    def write(self, data: bytes) -> None:
+        if not self.failed:
+            self._file.write(data)
+
+    def close(self) -> bool:
+        if self.failed or self.completed:
+            return self.completed
+        try:
+            self._file.close()
+            os.replace(self._temp_path, self.path)
+            self.completed = True
+        except OSError as e:
+            logger.error(f"Failed to write {self.path}: {e}")
+            self.abort()
+        return self.completed
+
+    def abort(self) -> None:
+        self.failed = True
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+class LocalStorage:
+    """Files under a local directory, optionally reachable at `base_url`
+
+    The directory should not be publicly served: without `base_url` presign()
+    returns None and callers stream files through the app instead.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str, base_url: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def path(self, key: str) -> str:
+        """Filesystem path of a key; keys may not escape the storage root"""
+        path = os.path.normpath(os.path.join(self.root, key.lstrip("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put(self, key: str, content: bytes, content_type: Optional[str] = None) -> None:
+        writer = self.open_writer(key)
+        writer.write(content)
+        if not writer.close():
+            raise OSError(f"Failed to write {key}")
+
+    def get(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as stored_file:
+            return stored_file.read()
+
+    def stream(self, key: str) -> Tuple[Iterator[bytes], Optional[int]]:
+        path = self.path(key)
+        size = os.path.getsize(path)
+        stored_file = open(path, "rb")
+
+        def generate():
+            with stored_file:
+                while True:
+                    chunk = stored_file.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return generate(), size
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def presign(self, key: str, filename: Optional[str] = None, expires_in: int = 300) -> Optional[str]:
+        # Only an explicitly configured URL is handed out; it does not expire, so whatever serves
+        # base_url has to do its own access control
+        if self.base_url is None:
+            return None
+        return f"{self.base_url}/{quote(key.lstrip('/'))}"
+
+    def open_writer(self, key: str, content_type: str = 'application/octet-stream') -> _LocalFileWriter:
+        return _LocalFileWriter(self.path(key))
+
+
+class _MemoryWriter:
+    """Collects bytes and stores them in a MemoryStorage on close()"""
+
+    def __init__(self, storage: "MemoryStorage", key: str):
+        self._storage = storage
+        self._key = key
+        self._buffer = bytearray()
+        self.completed = False
+        self.failed = False
+
+    def write(self, data: bytes) -> None:
+        if not self.failed:
+            self._buffer.extend(data)
+
+    def close(self) -> bool:
+        if not self.failed and not self.completed:
+            self._storage.put(self._key, bytes(self._buffer))
+            self.completed = True
+        self._buffer = bytearray()
+        return self.completed
+
+    def abort(self) -> None:
+        self.failed = True
+        self._buffer = bytearray()
+
+
+class MemoryStorage:
+    """Objects kept in a dict for the life of the process; for benchmarks and runs without network"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._objects: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def put(self, key: str, content: bytes, content_type: Optional[str] = None) -> None:
+        with self._lock:
+            self._objects[key] = bytes(content)
+
+    def get(self, key: str) -> bytes:
+        with self._lock:
+            if key not in self._objects:
+                raise FileNotFoundError(key)
+            return self._objects[key]
+
+    def stream(self, key: str) -> Tuple[Iterator[bytes], Optional[int]]:
+        content = self.get(key)
+        chunks = (content[start:start + STREAM_CHUNK_SIZE] for start in range(0, len(content), STREAM_CHUNK_SIZE))
+        return chunks, len(content)
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return key in self._objects
+
+    def presign(self, key: str, filename: Optional[str] = None, expires_in: int = 300) -> Optional[str]:
+        return None
+
+    def open_writer(self, key: str, content_type: str = 'application/octet-stream') -> _MemoryWriter:
+        return _MemoryWriter(self, key)
+
+
+def create_storage(backend: str, s3_client=None, bucket_name: Optional[str] = None,
+                   local_root: str = "output", local_url: Optional[str] = None, transfer_config=None):
+    """Build the configured storage backend; None when S3 is selected but no client is available"""
+    if backend == "local":
+        return LocalStorage(local_root, local_url)
+    if backend == "memory":
+        return MemoryStorage()
+    if backend != "s3":
+        logger.warning(f"Unknown storage backend '{backend}', using s3")
+    if s3_client is None:
+        return None
+    return S3Storage(s3_client, bucket_name, transfer_config)
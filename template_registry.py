@@ -0,0 +1,277 @@
+import copy
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from docx_xml import MAIN_DOCUMENT_PART, normalize_part, paragraph_text, parse_part, serialize_part, w, write_package
+from zip_writer import ZipMember, read_members
+
+logger = logging.getLogger(__name__)
+
+# Placeholders in the templates look like "(PETITIONER)" or "(Double_Circuit_Feeder_Location)". Literal
+# template text can look the same, e.g. "(KSEB)" or "(ii)", so a registry given the known placeholders
+# only ever touches those; this generic pattern is the fallback when none are given
+PLACEHOLDER_PATTERN = re.compile(r"\([A-Za-z][A-Za-z0-9_]*\)")
+
+# "docx" renders through python-docx, "xml" edits word/document.xml directly with lxml
+RENDER_MODES = ("docx", "xml")
+
+# Parts of a package that hold text: the body, headers, footers, footnotes and endnotes
+STORY_PART_PATTERN = re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml")
+
+
+def compile_placeholder_pattern(placeholders: Iterable[str]) -> "re.Pattern[str]":
+    """Compile a pattern matching exactly the given placeholder tokens, longest first"""
+    ordered = sorted(set(placeholders), key=len, reverse=True)
+    if not ordered:
+        return re.compile(r"(?!)")
+    return re.compile("|".join(re.escape(placeholder) for placeholder in ordered))
+
+
+@dataclass(frozen=True)
+class PlaceholderLocation:
+    """A paragraph holding placeholders, addressed by child indexes from its part's root"""
+    path: Tuple[int, ...]
+    placeholders: FrozenSet[str]
+
+
+@dataclass
+class LoadedTemplate:
+    """A parsed and normalized template kept in memory as a read-only master"""
+    path: str
+    source: bytes
+    version: str
+    members: List[ZipMember]
+    render_mode: str
+    load_time: float
+    document: Any = None
+    # Placeholder tokens that had to be merged from several runs at load time
+    merged_placeholders: int = 0
+    # Only story parts that contain placeholders appear in these two maps
+    part_index: Dict[str, List[PlaceholderLocation]] = field(default_factory=dict)
+    part_roots: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def placeholders(self) -> FrozenSet[str]:
+        """All placeholder tokens found anywhere in the template"""
+        return frozenset().union(*(
+            location.placeholders for index in self.part_index.values() for location in index
+        ))
+
+    def clone(self):
+        """Return a private copy of the master python-docx document for a single render"""
+        return copy.deepcopy(self.document)
+
+    def clone_part(self, part_name: str):
+        """Return a private copy of a master story part tree for a single render"""
+        return copy.deepcopy(self.part_roots[part_name])
+
+    @staticmethod
+    def locate(root, location: PlaceholderLocation):
+        """Return the paragraph element under `root` that matches an indexed location"""
+        element = root
+        for index in location.path:
+            element = element[index]
+        return element
+
+
+class TemplateRegistry:
+    """Parses each configured template once per worker and hands out clones"""
+
+    def __init__(self, templates: Dict[str, str], default_mode: str = "docx",
+                 render_modes: Optional[Dict[str, str]] = None, placeholders: Optional[Iterable[str]] = None,
+                 base_dir: Optional[str] = None):
+        self.templates = dict(templates)
+        # Relative template paths are resolved against this directory rather than the working directory
+        self.base_dir = base_dir
+        self.default_mode = default_mode
+        self.render_modes = dict(render_modes or {})
+        # Tokens that are normalized and indexed in the templates
+        self.pattern = compile_placeholder_pattern(placeholders) if placeholders is not None else PLACEHOLDER_PATTERN
+        self._loaded: Dict[str, LoadedTemplate] = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_path: str) -> LoadedTemplate:
+        """Return the parsed master for a template, loading it on first use"""
+        loaded = self._loaded.get(template_path)
+        if loaded is not None:
+            return loaded
+
+        with self._lock:
+            loaded = self._loaded.get(template_path)
+            if loaded is None:
+                loaded = self._load(self.resolve(template_path), self.render_mode_for(template_path), self.pattern)
+                self._loaded[template_path] = loaded
+        return loaded
+
+    def resolve(self, template_path: str) -> str:
+        """Filesystem path of a configured template"""
+        if self.base_dir is None or os.path.isabs(template_path):
+            return template_path
+        return os.path.join(self.base_dir, template_path)
+
+    def render_mode_for(self, template_path: str) -> str:
+        """Return the configured renderer for a template path"""
+        for name, path in self.templates.items():
+            if path == template_path and name in self.render_modes:
+                mode = self.render_modes[name]
+                break
+        else:
+            mode = self.default_mode
+
+        if mode not in RENDER_MODES:
+            logger.warning(f"Unknown render mode '{mode}' for {template_path}, using docx")
+            return "docx"
+        return mode
+
+    def warm(self) -> None:
+        """Load every configured template up front, e.g. in a server's master process before it forks"""
+        started = time.perf_counter()
+        for name, template_path in self.templates.items():
+            try:
+                self.get(template_path)
+            except Exception as e:
+                logger.error(f"Failed to load template {name}: {e}")
+        logger.info(f"Templates warmed in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    @property
+    def is_warm(self) -> bool:
+        """Whether every configured template is loaded"""
+        return all(path in self._loaded for path in self.templates.values())
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Load state of each configured template, without loading anything"""
+        status = {}
+        for name, template_path in self.templates.items():
+            template = self._loaded.get(template_path)
+            status[name] = {
+                "loaded": template is not None,
+                "render_mode": template.render_mode if template else self.render_mode_for(template_path),
+                "load_time_ms": round(template.load_time * 1000, 1) if template else None,
+            }
+        return status
+
+    def dependency_map(self) -> Dict[str, List[str]]:
+        """Map each placeholder to the names of the templates that contain it"""
+        dependencies: Dict[str, List[str]] = {}
+        for name, template_path in self.templates.items():
+            for placeholder in self.get(template_path).placeholders:
+                dependencies.setdefault(placeholder, []).append(name)
+        return dependencies
+
+    def templates_using(self, placeholders) -> List[str]:
+        """Names of the templates whose output depends on any of `placeholders`, in configuration order"""
+        dependencies = self.dependency_map()
+        affected = {name for placeholder in placeholders for name in dependencies.get(placeholder, ())}
+        return [name for name in self.templates if name in affected]
+
+    def placeholder_report(self) -> Dict[str, Dict[str, Any]]:
+        """Placeholders found in each configured template, loading any not yet loaded"""
+        report = {}
+        for name, template_path in self.templates.items():
+            try:
+                template = self.get(template_path)
+            except Exception as e:
+                report[name] = {"error": str(e)}
+                continue
+            report[name] = {
+                "placeholders": sorted(template.placeholders),
+                "parts": list(template.part_index),
+                "merged_placeholders": template.merged_placeholders,
+            }
+        return report
+
+    @staticmethod
+    def _load(template_path: str, render_mode: str, pattern: "re.Pattern[str]" = PLACEHOLDER_PATTERN) -> LoadedTemplate:
+        if not os.path.exists(template_path):
+            raise FileNotFoundError(template_path)
+
+        started = time.perf_counter()
+        with open(template_path, "rb") as template_file:
+            source = template_file.read()
+        members = read_members(source)
+        part_index: Dict[str, List[PlaceholderLocation]] = {}
+        part_roots: Dict[str, Any] = {}
+        cleaned_parts: Dict[str, bytes] = {}
+        merged = 0
+        with zipfile.ZipFile(io.BytesIO(source)) as template_zip:
+            for part_name in template_zip.namelist():
+                if not STORY_PART_PATTERN.fullmatch(part_name):
+                    continue
+                blob = template_zip.read(part_name)
+                root = parse_part(blob)
+                merged += normalize_part(root, pattern)
+                cleaned = serialize_part(root)
+                if cleaned != blob:
+                    cleaned_parts[part_name] = cleaned
+                index = TemplateRegistry._build_placeholder_index(root, pattern)
+                if index:
+                    part_index[part_name] = index
+                    part_roots[part_name] = root
+
+        # Renders start from the cleaned package, so unchanged parts are still copied verbatim
+        if cleaned_parts:
+            source = write_package(members, cleaned_parts)
+            members = read_members(source)
+
+        # Only keep the representation the configured renderer works on; in docx
+        # mode the body is edited through python-docx, every other part with lxml
+        document = None
+        if render_mode == "docx":
+            from docx import Document
+
+            document = Document(io.BytesIO(source))
+            part_roots.pop(MAIN_DOCUMENT_PART, None)
+        load_time = time.perf_counter() - started
+        paragraph_count = sum(len(index) for index in part_index.values())
+        logger.info(
+            f"Template loaded: {template_path} ({render_mode}, {load_time * 1000:.1f} ms, "
+            f"{paragraph_count} paragraphs with placeholders in {', '.join(part_index) or 'no parts'}, "
+            f"{merged} split placeholders merged)"
+        )
+        return LoadedTemplate(
+            path=template_path,
+            source=source,
+            version=f"{hashlib.sha256(source).hexdigest()}:{render_mode}",
+            members=members,
+            render_mode=render_mode,
+            load_time=load_time,
+            document=document,
+            merged_placeholders=merged,
+            part_index=part_index,
+            part_roots=part_roots,
+        )
+
+    @staticmethod
+    def _build_placeholder_index(root, pattern: "re.Pattern[str]" = PLACEHOLDER_PATTERN) -> List[PlaceholderLocation]:
+        """Record which paragraphs of a part contain placeholders
+
+        Every paragraph is visited, including those in nested tables and text
+        boxes. Locations are in document order, so a paragraph nested inside
+        another one always comes after it.
+        """
+        index = []
+        for paragraph in root.iter(w("p")):
+            placeholders = frozenset(pattern.findall(paragraph_text(paragraph)))
+            if placeholders:
+                index.append(PlaceholderLocation(
+                    path=TemplateRegistry._element_path(root, paragraph),
+                    placeholders=placeholders,
+                ))
+        return index
+
+    @staticmethod
+    def _element_path(root, element) -> Tuple[int, ...]:
+        path = []
+        while element is not root:
+            parent = element.getparent()
+            path.append(parent.index(element))
+            element = parent
+        return tuple(reversed(path))
@@ -0,0 +1,206 @@
+import io
+import struct
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import List, Tuple
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4H2LH")
+_ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_EXTRA_HEADER = struct.Struct("<2H")
+
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_CENTRAL_SIGNATURE = b"PK\x01\x02"
+_END_SIGNATURE = b"PK\x05\x06"
+_ZIP64_END_SIGNATURE = b"PK\x06\x06"
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+
+_VERSION = 20
+_ZIP64_VERSION = 45
+_ZIP64_EXTRA_ID = 0x0001
+_UTF8_FLAG = 0x800
+_DATA_DESCRIPTOR_FLAG = 0x08
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ENTRY_LIMIT = 0xFFFF
+
+
+@dataclass(frozen=True)
+class ZipMember:
+    """An archive member held as already-compressed bytes, ready to be copied verbatim"""
+    filename: str
+    compress_type: int
+    date_time: Tuple[int, int, int, int, int, int]
+    crc: int
+    compress_size: int
+    file_size: int
+    flag_bits: int
+    external_attr: int
+    data: bytes
+
+
+def read_members(source: bytes) -> List[ZipMember]:
+    """Split an archive into its members without decompressing anything"""
+    members = []
+    with zipfile.ZipFile(io.BytesIO(source)) as archive:
+        for info in archive.infolist():
+            header = _LOCAL_HEADER.unpack_from(source, info.header_offset)
+            name_length, extra_length = header[-2], header[-1]
+            start = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+            members.append(ZipMember(
+                filename=info.filename,
+                compress_type=info.compress_type,
+                date_time=info.date_time,
+                crc=info.CRC,
+                compress_size=info.compress_size,
+                file_size=info.file_size,
+                flag_bits=info.flag_bits & ~_DATA_DESCRIPTOR_FLAG,
+                external_attr=info.external_attr,
+                data=source[start:start + info.compress_size],
+            ))
+    return members
+
+
+def compress_member(filename: str, data: bytes, date_time: Tuple[int, int, int, int, int, int],
+                    compress_type: int = zipfile.ZIP_DEFLATED, external_attr: int = 0o600 << 16) -> ZipMember:
+    """Compress `data` into a member that can be written with ZipStreamWriter"""
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+    elif compress_type == zipfile.ZIP_STORED:
+        compressed = data
+    else:
+        raise ValueError(f"Unsupported compression type: {compress_type}")
+
+    return ZipMember(
+        filename=filename,
+        compress_type=compress_type,
+        date_time=date_time,
+        crc=zlib.crc32(data),
+        compress_size=len(compressed),
+        file_size=len(data),
+        flag_bits=0,
+        external_attr=external_attr,
+        data=compressed,
+    )
+
+
+class ChunkSink:
+    """File-like target that collects written bytes until they are drained
+
+    Every write is also passed on to each of `mirrors`, e.g. an S3 upload
+    that should receive the same bytes as the HTTP response.
+    """
+
+    def __init__(self, *mirrors):
+        self._chunks: List[bytes] = []
+        self._mirrors = mirrors
+
+    def write(self, data: bytes) -> None:
+        self._chunks.append(data)
+        for mirror in self._mirrors:
+            mirror.write(data)
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain"""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStreamWriter:
+    """Writes a zip archive front to back onto any object with a write() method
+
+    Members are written as soon as they are added and only the central directory
+    entries are kept until close(), so the target does not need to be seekable.
+    Sizes, offsets and entry counts beyond the zip32 limits are written as
+    ZIP64 records, so archives of any size or member count can be streamed.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._offset = 0
+        self._central_directory: List[bytes] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write_member(self, member: ZipMember) -> None:
+        """Append a member whose data is already compressed"""
+        filename = member.filename.encode("utf-8")
+        flag_bits = member.flag_bits
+        if not member.filename.isascii():
+            flag_bits |= _UTF8_FLAG
+        dos_time, dos_date = self._dos_date_time(member.date_time)
+
+        # The local header only needs ZIP64 for large sizes; the central directory also for a large offset
+        local_zip64 = member.file_size >= _ZIP32_LIMIT or member.compress_size >= _ZIP32_LIMIT
+        local_extra = self._zip64_extra(member.file_size, member.compress_size) if local_zip64 else b""
+        local_header = _LOCAL_HEADER.pack(
+            _LOCAL_SIGNATURE, _ZIP64_VERSION if local_zip64 else _VERSION, flag_bits, member.compress_type,
+            dos_time, dos_date, member.crc,
+            _ZIP32_LIMIT if local_zip64 else member.compress_size,
+            _ZIP32_LIMIT if local_zip64 else member.file_size,
+            len(filename), len(local_extra),
+        )
+
+        overflowed = [
+            value for value in (member.file_size, member.compress_size, self._offset) if value >= _ZIP32_LIMIT
+        ]
+        central_extra = self._zip64_extra(*overflowed) if overflowed else b""
+        version = _ZIP64_VERSION if overflowed else _VERSION
+        self._central_directory.append(_CENTRAL_HEADER.pack(
+            _CENTRAL_SIGNATURE, version, version, flag_bits, member.compress_type, dos_time, dos_date,
+            member.crc, min(member.compress_size, _ZIP32_LIMIT), min(member.file_size, _ZIP32_LIMIT),
+            len(filename), len(central_extra), 0, 0, 0, member.external_attr, min(self._offset, _ZIP32_LIMIT),
+        ) + filename + central_extra)
+
+        self._write(local_header + filename + local_extra)
+        self._write(member.data)
+
+    def writestr(self, filename: str, data: bytes, date_time: Tuple[int, int, int, int, int, int],
+                 compress_type: int = zipfile.ZIP_DEFLATED) -> None:
+        """Compress and append a member"""
+        self.write_member(compress_member(filename, data, date_time, compress_type))
+
+    def close(self) -> None:
+        """Write the central directory, completing the archive"""
+        start = self._offset
+        for entry in self._central_directory:
+            self._write(entry)
+        count = len(self._central_directory)
+        size = self._offset - start
+
+        if count >= _ENTRY_LIMIT or size >= _ZIP32_LIMIT or start >= _ZIP32_LIMIT:
+            zip64_end = self._offset
+            self._write(_ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+                _ZIP64_END_SIGNATURE, _ZIP64_END_OF_CENTRAL_DIRECTORY.size - 12, _ZIP64_VERSION, _ZIP64_VERSION,
+                0, 0, count, count, size, start,
+            ))
+            self._write(_ZIP64_LOCATOR.pack(_ZIP64_LOCATOR_SIGNATURE, 0, zip64_end, 1))
+        self._write(_END_OF_CENTRAL_DIRECTORY.pack(
+            _END_SIGNATURE, 0, 0, min(count, _ENTRY_LIMIT), min(count, _ENTRY_LIMIT),
+            min(size, _ZIP32_LIMIT), min(start, _ZIP32_LIMIT), 0,
+        ))
+
+    def _write(self, data: bytes) -> None:
+        self._fileobj.write(data)
+        self._offset += len(data)
+
+    @staticmethod
+    def _zip64_extra(*values: int) -> bytes:
+        """ZIP64 extended information field holding the given 64-bit values in order"""
+        return _ZIP64_EXTRA_HEADER.pack(_ZIP64_EXTRA_ID, 8 * len(values)) + struct.pack(f"<{len(values)}Q", *values)
+
+    @staticmethod
+    def _dos_date_time(date_time: Tuple[int, int, int, int, int, int]) -> Tuple[int, int]:
+        year, month, day, hour, minute, second = date_time
+        dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+        dos_time = hour << 11 | minute << 5 | second // 2
+        return dos_time, dos_date